@@ -1,15 +1,117 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
-from isa_calculator import calculate_portfolio_growth, get_rates_df
+from isa_calculator import iter_portfolio_growth, get_rates_df, CashflowSchedule
+from deployment import is_shared_mode, get_shared_pool, PoolBusy, SessionResultStore
 from decimal import Decimal
+import io
 import os
+import threading
+import time
+import uuid
 
 
+# pandas, matplotlib and the breakdown/export modules are imported where they're
+# first needed, so the sidebar renders without paying for them on a cold start.
+
 st.set_page_config(page_title="ISA Comparison Tool", layout="wide")
 
 
+@st.cache_data
+def load_custom_rates_template():
+    """Default rates and the custom-rates editor frame, built once per process."""
+    default_rates_df = get_rates_df()
+    # Create a simplified view for editing: Tax Year and a Rate column initialized with Best Rate
+    edit_df = default_rates_df[['Tax Year', 'Best Rate']].copy()
+    edit_df = edit_df.rename(columns={'Best Rate': 'Custom Rate'})
+    return default_rates_df, edit_df
+
+
+@st.fragment
+def edit_custom_rates():
+    """
+    Custom rates editor. Runs as a fragment, so editing the table, uploading or
+    saving only reruns this function; the edited rates are left in session state
+    for the next full run (e.g. pressing Calculate Performance).
+    """
+    import pandas as pd
+
+    # st.cache_data hands each session its own copy, so these are safe to modify
+    default_rates_df, edit_df = load_custom_rates_template()
+
+    # File Uploader
+    uploaded_file = st.file_uploader("Upload Custom Rates (CSV)", type="csv")
+    if uploaded_file is not None:
+        try:
+            uploaded_df = pd.read_csv(uploaded_file)
+            if 'Tax Year' in uploaded_df.columns and 'Custom Rate' in uploaded_df.columns:
+                # Merge or replace. Since we want strict tax years, let's merge on Tax Year or just replace values
+                # Ideally, we ensure the Tax Years match our default list.
+                # Simple approach: Merge uploaded 'Custom Rate' into clean `edit_df`
+
+                # Ensure matching types/format if possible, or just merge
+                temp_df = pd.merge(edit_df[['Tax Year']], uploaded_df[['Tax Year', 'Custom Rate']], on='Tax Year', how='left')
+
+                # Fill missing with default best rate if any tax years missing in upload?
+                # Or just use the defaults from edit_df where missing. 
+                # Let's check for missing values after merge
+
+                # Actually, let's just use update if we set index
+                edit_df.set_index('Tax Year', inplace=True)
+                uploaded_df_indexed = uploaded_df.set_index('Tax Year')
+                edit_df.update(uploaded_df_indexed)
+                edit_df.reset_index(inplace=True)
+
+                st.success("Custom Rates loaded successfully!")
+            else:
+                st.error("CSV must contain 'Tax Year' and 'Custom Rate' columns.")
+        except Exception as e:
+            st.error(f"Error loading CSV: {e}")
+
+    edited_df = st.data_editor(
+        edit_df, 
+        num_rows="fixed",
+        hide_index=True,
+        column_config={
+            "Tax Year": st.column_config.TextColumn(
+                "Tax Year",
+                disabled=True
+            ),
+            "Custom Rate": st.column_config.NumberColumn(
+                "Custom Rate (%)",
+                min_value=0.0,
+                max_value=100.0,
+                step=0.1,
+                format="%.2f%%"
+            )
+        },
+        key="custom_rates_editor"
+    )
+
+    # Save to Disk (Local Path)
+    st.write("---")
+    st.write("**Save to Local Disk**")
+    default_filename = os.path.join(os.getcwd(), "custom_rates.csv")
+    save_path = st.text_input("File Path (e.g. C:/data/my_rates.csv)", value=default_filename)
+    if st.button("Save to Disk"):
+        if save_path:
+            try:
+                # Ensure directory exists or let pandas/OS handle error if not
+                # For simplicity, just try to save
+                edited_df.to_csv(save_path, index=False)
+                st.success(f"Successfully saved to {save_path}")
+            except Exception as e:
+                st.error(f"Error saving file: {e}")
+        else:
+            st.error("Please enter a file path.")
+
+    # Merge back into the full rates structure to pass to calculator
+    # We need the other columns (Dates, Allowance) from default_rates_df
+    # We will map the edited 'Custom Rate' back to a 'Custom Rate' column in the full df
+    custom_rates_df_final = default_rates_df.copy()
+    # Join on Tax Year to get the updated rates
+    custom_rates_df_final['Custom Rate'] = edited_df['Custom Rate']
+    st.session_state['custom_rates_df'] = custom_rates_df_final
+
 
 # Buy Me a Coffee Button
 st.sidebar.markdown(
@@ -96,322 +198,297 @@ custom_rates_df_final = None
 
 if use_custom_rates:
     with st.sidebar.expander("Edit Custom Rates"):
-        default_rates_df = get_rates_df()
-        # Create a simplified view for editing: Tax Year and a Rate column initialized with Best Rate
-        edit_df = default_rates_df[['Tax Year', 'Best Rate']].copy()
-        edit_df = edit_df.rename(columns={'Best Rate': 'Custom Rate'})
-        
-        # File Uploader
-        uploaded_file = st.file_uploader("Upload Custom Rates (CSV)", type="csv")
-        if uploaded_file is not None:
-            try:
-                uploaded_df = pd.read_csv(uploaded_file)
-                if 'Tax Year' in uploaded_df.columns and 'Custom Rate' in uploaded_df.columns:
-                    # Merge or replace. Since we want strict tax years, let's merge on Tax Year or just replace values
-                    # Ideally, we ensure the Tax Years match our default list.
-                    # Simple approach: Merge uploaded 'Custom Rate' into clean `edit_df`
-                    
-                    # Ensure matching types/format if possible, or just merge
-                    temp_df = pd.merge(edit_df[['Tax Year']], uploaded_df[['Tax Year', 'Custom Rate']], on='Tax Year', how='left')
-                    
-                    # Fill missing with default best rate if any tax years missing in upload?
-                    # Or just use the defaults from edit_df where missing. 
-                    # Let's check for missing values after merge
-                    
-                    # Actually, let's just use update if we set index
-                    edit_df.set_index('Tax Year', inplace=True)
-                    uploaded_df_indexed = uploaded_df.set_index('Tax Year')
-                    edit_df.update(uploaded_df_indexed)
-                    edit_df.reset_index(inplace=True)
-                    
-                    st.success("Custom Rates loaded successfully!")
-                else:
-                    st.error("CSV must contain 'Tax Year' and 'Custom Rate' columns.")
-            except Exception as e:
-                st.error(f"Error loading CSV: {e}")
-        
-        edited_df = st.data_editor(
-            edit_df, 
-            num_rows="fixed",
-            hide_index=True,
-            column_config={
-                "Tax Year": st.column_config.TextColumn(
-                    "Tax Year",
-                    disabled=True
-                ),
-                "Custom Rate": st.column_config.NumberColumn(
-                    "Custom Rate (%)",
-                    min_value=0.0,
-                    max_value=100.0,
-                    step=0.1,
-                    format="%.2f%%"
-                )
-            },
-            key="custom_rates_editor"
-        )
-        
-        # Save to Disk (Local Path)
-        st.write("---")
-        st.write("**Save to Local Disk**")
-        default_filename = os.path.join(os.getcwd(), "custom_rates.csv")
-        save_path = st.text_input("File Path (e.g. C:/data/my_rates.csv)", value=default_filename)
-        if st.button("Save to Disk"):
-            if save_path:
-                try:
-                    # Ensure directory exists or let pandas/OS handle error if not
-                    # For simplicity, just try to save
-                    edited_df.to_csv(save_path, index=False)
-                    st.success(f"Successfully saved to {save_path}")
-                except Exception as e:
-                    st.error(f"Error saving file: {e}")
-            else:
-                st.error("Please enter a file path.")
-        
-        # Merge back into the full rates structure to pass to calculator
-        # We need the other columns (Dates, Allowance) from default_rates_df
-        # We will map the edited 'Custom Rate' back to a 'Custom Rate' column in the full df
-        custom_rates_df_final = default_rates_df.copy()
-        # Join on Tax Year to get the updated rates
-        custom_rates_df_final['Custom Rate'] = edited_df['Custom Rate']
+        edit_custom_rates()
+    custom_rates_df_final = st.session_state.get('custom_rates_df')
 
 # Calculations
-if st.button("Calculate Performance", type="primary"):
-    with st.spinner("Calculating..."):
-        # Calculate for Best Rate
-        df_best = calculate_portfolio_growth(
-            Decimal(initial_investment), Decimal(recurring_amount), frequency, lump_sums, 'Best Rate', start_date, end_date, inflation_type, interest_freq
-        )
-        
-        # Calculate for Average Rate
-        df_avg = calculate_portfolio_growth(
-            Decimal(initial_investment), Decimal(recurring_amount), frequency, lump_sums, 'Average Rate', start_date, end_date, inflation_type, interest_freq
-        )
+SCENARIO_RATE_TYPES = ['Best Rate', 'Average Rate', 'Lowest Rate']
 
-        # Calculate for Lowest Rate
-        df_low = calculate_portfolio_growth(
-            Decimal(initial_investment), Decimal(recurring_amount), frequency, lump_sums, 'Lowest Rate', start_date, end_date, inflation_type, interest_freq
-        )
-        
-        df_custom = None
-        if use_custom_rates and custom_rates_df_final is not None:
-             df_custom = calculate_portfolio_growth(
-                Decimal(initial_investment), Decimal(recurring_amount), frequency, lump_sums, 'Custom Rate', start_date, end_date, inflation_type, interest_freq, custom_rates_df=custom_rates_df_final
-            )
-        
-        # Metrics
-        # Use 'Real Balance' if inflation is selected, otherwise 'Balance' (which are same if None)
-        # Actually, let's always use 'Real Balance' column as it defaults to Balance if None
-        final_best = df_best['Real Balance'].iloc[-1]
-        final_avg = df_avg['Real Balance'].iloc[-1]
-        final_low = df_low['Real Balance'].iloc[-1]
-        
-        final_custom = df_custom['Real Balance'].iloc[-1] if df_custom is not None else None
-        
-        total_invested = df_best['Total Invested'].iloc[-1]
-        
-        # If inflation adjusted, Total Invested should probably also be real? 
-        # For now, let's keep Total Invested as Nominal Cash Put In, but show Final Value in Real Terms.
-        # This shows "Buying Power" vs "Cash Put In".
-        
-        cols = st.columns(5) if df_custom is not None else st.columns(4)
+# How often partial results are redrawn while a calculation runs (seconds)
+PROGRESS_REDRAW_INTERVAL = 0.5
+
+val_label = "Value" if inflation_type == "None" else f"Real Value ({inflation_type})"
+
+def format_delta(val):
+    return f"-£{abs(val):,.2f}" if val < 0 else f"£{val:,.2f}"
+
+def render_metrics(slot, frames, show_custom):
+    """Final (or latest so far) value of each scenario. Scenarios not started yet show a placeholder."""
+    # Use 'Real Balance' if inflation is selected, otherwise 'Balance' (which are same if None)
+    # Actually, let's always use 'Real Balance' column as it defaults to Balance if None
+    # If inflation adjusted, Total Invested should probably also be real? 
+    # For now, let's keep Total Invested as Nominal Cash Put In, but show Final Value in Real Terms.
+    # This shows "Buying Power" vs "Cash Put In".
+    with slot.container():
+        cols = st.columns(5) if show_custom else st.columns(4)
+
+        df_invested = next((df for df in frames.values() if not df.empty), None)
+        if df_invested is None:
+            cols[0].metric("Total Invested (Nominal)", "…")
+            return
+        total_invested = df_invested['Total Invested'].iloc[-1]
         cols[0].metric("Total Invested (Nominal)", f"£{total_invested:,.2f}")
-        
-        val_label = "Value" if inflation_type == "None" else f"Real Value ({inflation_type})"
-        
-        def format_delta(val):
-            return f"-£{abs(val):,.2f}" if val < 0 else f"£{val:,.2f}"
-
-        cols[1].metric(f"Best Rate {val_label}", f"£{final_best:,.2f}", delta=format_delta(final_best - total_invested))
-        cols[2].metric(f"Avg Rate {val_label}", f"£{final_avg:,.2f}", delta=format_delta(final_avg - total_invested))
-        cols[3].metric(f"Lowest Rate {val_label}", f"£{final_low:,.2f}", delta=format_delta(final_low - total_invested))
-        
-        if df_custom is not None:
-             cols[4].metric(f"Custom Rate {val_label}", f"£{final_custom:,.2f}", delta=format_delta(final_custom - total_invested))
-        
-        # Plotting
-        # Set style to dark background for this plot
-        plt.style.use('dark_background')
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Ensure figure and axes background are black (though style.use should handle most)
-        fig.patch.set_facecolor('black')
-        ax.set_facecolor('black')
-        
+
+        labels = [('Best Rate', 'Best Rate'), ('Average Rate', 'Avg Rate'), ('Lowest Rate', 'Lowest Rate')]
+        if show_custom:
+            labels.append(('Custom Rate', 'Custom Rate'))
+
+        for col, (name, label) in zip(cols[1:], labels):
+            df = frames.get(name)
+            if df is None or df.empty:
+                col.metric(f"{label} {val_label}", "…")
+                continue
+            final = df['Real Balance'].iloc[-1]
+            col.metric(f"{label} {val_label}", f"£{final:,.2f}", delta=format_delta(final - df['Total Invested'].iloc[-1]))
+
+def render_chart(slot, frames, x_limits=None):
+    """Balance over time for every scenario that has data so far."""
+    from matplotlib.figure import Figure
+
+    # Build the figure through the object API rather than pyplot, so concurrent
+    # sessions don't share pyplot's global figure list or style state.
+    # The dark background colours are set explicitly below.
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+
+    # Ensure figure and axes background are black
+    fig.patch.set_facecolor('black')
+    ax.set_facecolor('black')
+
+    df_best = frames.get('Best Rate')
+    df_avg = frames.get('Average Rate')
+    df_low = frames.get('Lowest Rate')
+    df_custom = frames.get('Custom Rate')
+
+    if df_best is not None:
         ax.plot(df_best['Date'], df_best['Real Balance'], label=f'Best Rate ({val_label})', color='#00ff00', linewidth=2) # Bright green
+    if df_avg is not None:
         ax.plot(df_avg['Date'], df_avg['Real Balance'], label=f'Average Rate ({val_label})', color='#00ccff', linewidth=2) # Bright blue
+    if df_low is not None:
         ax.plot(df_low['Date'], df_low['Real Balance'], label=f'Lowest Rate ({val_label})', color='#ff3333', linewidth=2) # Red
-        
-        if df_custom is not None:
-             ax.plot(df_custom['Date'], df_custom['Real Balance'], label=f'Custom Rate ({val_label})', color='#ffff00', linewidth=2, linestyle='--') # Yellow dashed
 
+    if df_custom is not None:
+         ax.plot(df_custom['Date'], df_custom['Real Balance'], label=f'Custom Rate ({val_label})', color='#ffff00', linewidth=2, linestyle='--') # Yellow dashed
+
+    if df_best is not None:
         ax.plot(df_best['Date'], df_best['Total Invested'], label='Total Invested (Nominal)', color='#CCCCCC', linestyle='--', alpha=0.7)
-        
-        ax.set_title(f"Portfolio {val_label} Over Time", color='white')
-        ax.set_xlabel("Year", color='white')
-        ax.set_ylabel(f"{val_label} (£)", color='white')
-        
-        # Tick colors
-        ax.tick_params(axis='x', colors='white')
-        ax.tick_params(axis='y', colors='white')
-        
-        # Spines
-        for spine in ax.spines.values():
-            spine.set_color('white')
-            
-        legend = ax.legend(facecolor='black', edgecolor='white')
-        plt.setp(legend.get_texts(), color='white')
-        
-        ax.grid(True, alpha=0.3, color='gray')
-        
-        # Format y-axis as currency
-        ax.yaxis.set_major_formatter('£{x:1.2f}')
-        
-        st.pyplot(fig)
-        
-        # Data Table
-        st.subheader("Yearly Breakdown (Tax Year)")
-        
-        def get_tax_year(d):
-            if d.month < 4 or (d.month == 4 and d.day < 6):
-                return f"{d.year-1}/{d.year}"
-            else:
-                return f"{d.year}/{d.year+1}"
-
-        # Apply Tax Year grouping
-        # Apply Tax Year grouping
-        dfs_to_process = [df_best, df_avg, df_low]
-        if df_custom is not None:
-            dfs_to_process.append(df_custom)
-            
-        for df in dfs_to_process:
-            df['Tax Year'] = df['Date'].apply(get_tax_year)
-
-        yearly_best = df_best.groupby('Tax Year').last()[['Real Balance', 'Rate']].rename(columns={'Real Balance': 'Best Balance', 'Rate': 'Best Rate %'})
-        yearly_avg = df_avg.groupby('Tax Year').last()[['Real Balance', 'Rate']].rename(columns={'Real Balance': 'Avg Balance', 'Rate': 'Avg Rate %'})
-        yearly_low = df_low.groupby('Tax Year').last()[['Real Balance', 'Rate']].rename(columns={'Real Balance': 'Low Balance', 'Rate': 'Low Rate %'})
-        
+
+    # Partial results: keep the full period on the x axis so the chart doesn't rescale as it fills in
+    if x_limits is not None:
+        ax.set_xlim(*x_limits)
+
+    ax.set_title(f"Portfolio {val_label} Over Time", color='white')
+    ax.set_xlabel("Year", color='white')
+    ax.set_ylabel(f"{val_label} (£)", color='white')
+
+    # Tick colors
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+
+    # Spines
+    for spine in ax.spines.values():
+        spine.set_color('white')
+
+    if ax.lines:
+        ax.legend(facecolor='black', edgecolor='white', labelcolor='white')
+
+    ax.grid(True, alpha=0.3, color='gray')
+
+    # Format y-axis as currency
+    ax.yaxis.set_major_formatter('£{x:1.2f}')
+
+    slot.pyplot(fig)
+
+@st.fragment
+def show_breakdown(results, inputs_key, result_store):
+    """
+    Paginated breakdown table. A fragment, so paging doesn't redraw the chart.
+
+    Each view's table is built once per set of inputs and kept with the
+    session's results, so changing page only slices and styles one page.
+    """
+    from breakdown import BREAKDOWN_VIEWS, build_breakdown, page_count, get_page, style_breakdown
+
+    st.subheader("Breakdown")
+
+    view_col, size_col, page_col = st.columns([2, 1, 1])
+    view = view_col.radio("View", BREAKDOWN_VIEWS, horizontal=True, key="breakdown_view")
+    page_size = size_col.selectbox("Rows per page", [25, 50, 100, 250], index=1, key="breakdown_page_size")
+
+    breakdown_key = ('breakdown', inputs_key, view)
+    breakdown_df = result_store.get(breakdown_key)
+    if breakdown_df is None:
+        breakdown_df = build_breakdown(results, view, inflation_type)
+        result_store.put(breakdown_key, breakdown_df)
+    n_pages = page_count(breakdown_df, page_size)
+    page = page_col.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=f"breakdown_page_{view}_{page_size}")
+
+    # Only the visible page is styled and sent to the browser
+    page_df = get_page(breakdown_df, int(page), page_size)
+    st.dataframe(style_breakdown(page_df, inflation_type), height=450)
+
+@st.fragment
+def show_export(results, inputs_key, result_store):
+    """Export controls. A fragment, so choosing a format doesn't redraw the results."""
+    from export import EXPORT_FORMATS, EXPORT_GRANULARITIES, FILE_EXTENSIONS, MIME_TYPES, export_results
+
+    with st.expander("Export Results"):
+        export_cols = st.columns(2)
+        export_granularity = export_cols[0].selectbox("Rows", EXPORT_GRANULARITIES, key="export_granularity")
+        export_fmt = export_cols[1].selectbox("Format", EXPORT_FORMATS, key="export_format")
+
+        # Files are only built on request, and kept with the session's results,
+        # under the same memory cap, until the inputs change
+        export_key = ('export', inputs_key, export_granularity, export_fmt)
+        export_data = result_store.get(export_key)
+        if st.button("Prepare Download"):
+            buffer = io.BytesIO()
+            try:
+                export_results(results, buffer, export_fmt, export_granularity)
+                export_data = buffer.getvalue()
+                if not result_store.put(export_key, export_data):
+                    st.caption("This file is too large to keep for this session and will need preparing again.")
+            except ImportError as e:
+                st.error(str(e))
+
+        if export_data is not None:
+            st.download_button(
+                f"Download {export_fmt}",
+                data=export_data,
+                file_name=f"isa_results_{export_granularity.lower().replace(' ', '_')}.{FILE_EXTENSIONS[export_fmt]}",
+                mime=MIME_TYPES[export_fmt],
+            )
+
+def consume_chunks(chunks, out, cancel_event):
+    """Worker side of a progressive run: collects tax-year chunks until done or cancelled."""
+    for chunk in chunks:
+        if cancel_event.is_set():
+            return False
+        out.append(chunk)
+    return True
+
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
+if 'result_store' not in st.session_state:
+    # Results are kept per session (capped) so reruns don't recalculate
+    st.session_state['result_store'] = SessionResultStore()
+result_store = st.session_state['result_store']
+
+# A rerun means any calculation still running for this session was interrupted
+# (inputs changed or the button was pressed again), so stop it.
+previous_cancel = st.session_state.pop('cancel_event', None)
+if previous_cancel is not None:
+    previous_cancel.set()
+    if is_shared_mode():
+        get_shared_pool().cancel_session(st.session_state['session_id'])
+
+# Everything the results depend on
+inputs_key = (
+    start_date, end_date, initial_investment, recurring_amount, frequency, interest_freq,
+    tuple(lump_sums), inflation_type,
+    tuple(custom_rates_df_final['Custom Rate']) if use_custom_rates and custom_rates_df_final is not None else None,
+)
+
+calculate_clicked = st.button("Calculate Performance", type="primary")
+results = result_store.get(inputs_key)
+
+# Metrics and chart are drawn into fixed slots so partial results can be replaced in place
+progress_slot = st.empty()
+metrics_slot = st.empty()
+chart_slot = st.empty()
+
+if calculate_clicked and results is None:
+    import pandas as pd
+
+    # Compile the cashflow calendar once and reuse it for every scenario
+    schedule = CashflowSchedule(
+        start_date, end_date, frequency, Decimal(recurring_amount), lump_sums, Decimal(initial_investment), interest_freq
+    )
+
+    scenario_args = {
+        rate_type: (rate_type, None) for rate_type in SCENARIO_RATE_TYPES
+    }
+    if use_custom_rates and custom_rates_df_final is not None:
+        scenario_args['Custom Rate'] = ('Custom Rate', custom_rates_df_final)
+
+    def scenario_chunks(rate_type, custom_rates_df):
+        return iter_portfolio_growth(
+            Decimal(initial_investment), Decimal(recurring_amount), frequency, lump_sums, rate_type, start_date, end_date, inflation_type, interest_freq, custom_rates_df=custom_rates_df, schedule=schedule
+        )
+
+    chunks = {name: [] for name in scenario_args}
+    total_days = max(len(schedule), 1)
+    x_limits = (schedule.dates[0], schedule.dates[-1]) if len(schedule) else None
+    last_redraw = time.monotonic()
+
+    def show_progress(force=False):
+        """Redraws progress, metrics and the partial chart, at most every PROGRESS_REDRAW_INTERVAL."""
+        global last_redraw
+        if not force and time.monotonic() - last_redraw < PROGRESS_REDRAW_INTERVAL:
+            return
+        last_redraw = time.monotonic()
+
+        # Snapshot the chunk lists; workers may still be appending
+        partial = {name: pd.concat(list(parts), ignore_index=True) for name, parts in chunks.items() if parts}
+        done_days = min((sum(len(c) for c in parts) for parts in chunks.values()), default=0)
+        progress_slot.progress(min(done_days / total_days, 1.0), text="Calculating...")
+        if partial:
+            render_metrics(metrics_slot, partial, 'Custom Rate' in scenario_args)
+            render_chart(chart_slot, partial, x_limits)
+
+    completed = False
+    if is_shared_mode():
+        # Heavy work goes to the bounded process-wide pool, served fairly between sessions
+        pool = get_shared_pool()
+        session_id = st.session_state['session_id']
+        cancel_event = threading.Event()
+        st.session_state['cancel_event'] = cancel_event
         try:
-             yearly_custom = df_custom.groupby('Tax Year').last()[['Real Balance', 'Rate']].rename(columns={'Real Balance': 'Cust Balance', 'Rate': 'Cust Rate %'}) if df_custom is not None else None
-        except Exception:
-             # Fallback if something goes wrong with custom grouping
-             yearly_custom = None
-
-        # Get Inflation Rate from one of the DFs (e.g., df_best)
-        # Instead of just taking the last value, we want the "Effective Rate" for the period.
-        # Effective Rate = (EndIndex / StartIndex) - 1
-        def calculate_effective_inflation(group):
-            if group.empty:
-                return 0.0
-            start_idx = group.iloc[0]['Inflation Index']
-            end_idx = group.iloc[-1]['Inflation Index']
-            
-            # If start_idx is 0 (shouldn't be), handle it
-            if start_idx == 0:
-                return 0.0
-                
-            # The group is daily records.
-            # However, start_idx is the index AFTER the first day's inflation? 
-            # Ideally we want index at START of period vs END of period.
-            # But the 'Inflation Index' column is the accumulated index at that day.
-            # So (End / Start) gives growth during the period EXCLUDING the very first day's previous state?
-            # Actually, `Inflation Index` starts at 1.0.
-            # If we take (Last / First), we get growth from Day 1 to Day N.
-            # But we might miss the inflation applied ON Day 1 if First is Day 1 End.
-            # But given daily compounding is tiny, (Last / First) is a decent approximation of "growth during this window".
-            
-            # To be more precise: 
-            # Growth = Index_Last / Index_Day_Before_Group
-            # But we don't have Day_Before easily.
-            # Let's use (Last / First) * (1 + daily_rate_of_first)? No too complex.
-            # Let's just use (Last / First) and normalize to annual if needed, but Tax Year is ~1 year.
-            # So (Last / First - 1) * 100 should be close to the blended rate.
-            
-            ratio = float(end_idx / start_idx)
-            return (ratio - 1) * 100
-
-        # We need to map this calculation to the Tax Year groups
-        yearly_inflation = df_best.groupby('Tax Year').apply(calculate_effective_inflation).to_frame(name=f'{inflation_type} %')
-        
-        # Get Total Invested for comparison
-        yearly_invested = df_best.groupby('Tax Year').last()[['Total Invested']]
-        
-        dfs_to_concat = [yearly_best, yearly_avg, yearly_low]
-        if yearly_custom is not None:
-            dfs_to_concat.append(yearly_custom)
-            
-        if inflation_type != 'None':
-            dfs_to_concat.append(yearly_inflation)
-        
-        dfs_to_concat.append(yearly_invested)
-        
-        yearly_summary = pd.concat(dfs_to_concat, axis=1)
-        
-        format_dict = {
-            'Best Balance': '£{:,.2f}',
-            'Avg Balance': '£{:,.2f}',
-            'Low Balance': '£{:,.2f}',
-            'Cust Balance': '£{:,.2f}',
-            'Best Rate %': '{:.2f}%',
-            'Avg Rate %': '{:.2f}%',
-            'Low Rate %': '{:.2f}%',
-            'Cust Rate %': '{:.2f}%',
-            f'{inflation_type} %': '{:.2f}%',
-            'Total Invested': '£{:,.2f}'
-        }
-        
-        # Ensure all values are floats for consistent rounding and display
-        for col in yearly_summary.columns:
-            yearly_summary[col] = yearly_summary[col].apply(lambda x: float(x) if isinstance(x, Decimal) else x)
-            
-        # Explicitly round to 2 decimal places for CSV export
-        yearly_summary = yearly_summary.round(2)
-        
-        # Center headers
-        styles = [
-            dict(selector="th", props=[("text-align", "center")]),
-            dict(selector="td", props=[("text-align", "center")])
-        ]
-        
-        def color_negative_performance(row):
-            invested = row['Total Invested']
-            colors = [''] * len(row)
-            
-            # Helper to set color
-            def set_color(val, threshold):
-                if val < threshold:
-                    return 'color: red'
-                return ''
-            
-            # Map column names to indices
-            col_indices = {name: i for i, name in enumerate(row.index)}
-            
-            # Balance checks
-            if 'Best Balance' in col_indices:
-                colors[col_indices['Best Balance']] = set_color(row['Best Balance'], invested)
-            if 'Avg Balance' in col_indices:
-                colors[col_indices['Avg Balance']] = set_color(row['Avg Balance'], invested)
-            if 'Low Balance' in col_indices:
-                colors[col_indices['Low Balance']] = set_color(row['Low Balance'], invested)
-            if 'Cust Balance' in col_indices:
-                colors[col_indices['Cust Balance']] = set_color(row['Cust Balance'], invested)
-            
-            # Rate checks
-            inflation_col = f'{inflation_type} %'
-            if inflation_type != 'None' and inflation_col in col_indices:
-                inflation_val = row[inflation_col]
-                if 'Best Rate %' in col_indices:
-                    colors[col_indices['Best Rate %']] = set_color(row['Best Rate %'], inflation_val)
-                if 'Avg Rate %' in col_indices:
-                    colors[col_indices['Avg Rate %']] = set_color(row['Avg Rate %'], inflation_val)
-                if 'Low Rate %' in col_indices:
-                    colors[col_indices['Low Rate %']] = set_color(row['Low Rate %'], inflation_val)
-                if 'Cust Rate %' in col_indices:
-                    colors[col_indices['Cust Rate %']] = set_color(row['Cust Rate %'], inflation_val)
-                
-            return colors
-
-        st.dataframe(yearly_summary.style.format(format_dict).set_table_styles(styles).apply(color_negative_performance, axis=1), height=450)
+            futures = [
+                pool.submit(session_id, consume_chunks, scenario_chunks(*args), chunks[name], cancel_event)
+                for name, args in scenario_args.items()
+            ]
+            while not all(future.done() for future in futures):
+                time.sleep(0.1)
+                show_progress()
+            completed = all(future.result() for future in futures)
+        except PoolBusy as e:
+            cancel_event.set()
+            pool.cancel_session(session_id)
+            st.warning(str(e))
+        st.session_state.pop('cancel_event', None)
+    else:
+        # Step the scenarios through the tax years together on the script thread.
+        # If the inputs change, Streamlit stops this run at the next redraw.
+        iterators = {name: scenario_chunks(*args) for name, args in scenario_args.items()}
+        while iterators:
+            for name in list(iterators):
+                chunk = next(iterators[name], None)
+                if chunk is None:
+                    del iterators[name]
+                else:
+                    chunks[name].append(chunk)
+            show_progress()
+        completed = True
+
+    progress_slot.empty()
+    if completed:
+        results = {name: pd.concat(parts, ignore_index=True) for name, parts in chunks.items()}
+        if not result_store.put(inputs_key, results):
+            st.caption("Results are too large to keep for this session and will be recalculated next time.")
+
+if results is not None:
+    # Metrics
+    render_metrics(metrics_slot, results, 'Custom Rate' in results)
+
+    # Plotting
+    render_chart(chart_slot, results)
+
+    # Data Table
+    show_breakdown(results, inputs_key, result_store)
+
+    # Export
+    show_export(results, inputs_key, result_store)
 
 else:
     st.info("Adjust settings in the sidebar and click 'Calculate Performance' to see the results.")
@@ -0,0 +1,104 @@
+"""
+Startup benchmark for the calculator and the app.
+
+Each measurement runs in a fresh Python process, so module imports and
+per-process caches are cold, the same as on a newly started host. Prints the
+median of several runs next to its budget, and exits with status 1 if any
+measurement is over budget.
+
+    python bench_startup.py            # 5 runs per measurement
+    python bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds. Set with headroom over a typical small cloud host.
+BUDGETS = {
+    'import isa_calculator': 0.3,
+    'first calculation (cold)': 2.5,
+    'calculation (warm)': 0.5,
+    'app first render': 3.0,
+    'app rerun': 0.5,
+}
+
+CALCULATOR_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import isa_calculator
+t1 = time.perf_counter()
+from decimal import Decimal
+args = (Decimal(1000), Decimal(100), 'Monthly', [], 'Best Rate')
+isa_calculator.calculate_portfolio_growth(*args, inflation_type='RPI')
+t2 = time.perf_counter()
+isa_calculator.calculate_portfolio_growth(*args, inflation_type='RPI')
+t3 = time.perf_counter()
+print(json.dumps({
+    'import isa_calculator': t1 - t0,
+    'first calculation (cold)': t2 - t1,
+    'calculation (warm)': t3 - t2,
+}))
+"""
+
+APP_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=60)
+t0 = time.perf_counter()
+at.run()
+t1 = time.perf_counter()
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({'app first render': t1 - t0, 'app rerun': t2 - t1}))
+"""
+
+
+def run_snippet(snippet):
+    """Runs a snippet in a fresh interpreter and returns the timings it prints."""
+    result = subprocess.run(
+        [sys.executable, '-c', snippet], cwd=HERE, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs):
+    samples = {name: [] for name in BUDGETS}
+    try:
+        import streamlit  # noqa: F401
+        snippets = [CALCULATOR_SNIPPET, APP_SNIPPET]
+    except ImportError:
+        print("streamlit is not installed, skipping the app measurements")
+        snippets = [CALCULATOR_SNIPPET]
+
+    for _ in range(runs):
+        for snippet in snippets:
+            for name, seconds in run_snippet(snippet).items():
+                samples[name].append(seconds)
+    return {name: statistics.median(values) for name, values in samples.items() if values}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement")
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+
+    over_budget = False
+    print(f"{'Measurement':<28}{'Median (s)':>12}{'Budget (s)':>12}")
+    for name, seconds in results.items():
+        budget = BUDGETS[name]
+        flag = '' if seconds <= budget else '  OVER BUDGET'
+        over_budget = over_budget or seconds > budget
+        print(f"{name:<28}{seconds:>12.3f}{budget:>12.2f}{flag}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
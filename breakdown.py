@@ -0,0 +1,150 @@
+"""
+Breakdown tables (tax year, monthly, daily) for the results page.
+
+The scenario frames hold Decimal objects. Each column is converted to a float
+array once, and the period rows are picked with numpy, so no Python function
+runs per row. Styling is computed column-wise for the visible page only, so
+a page of a 10,000-row daily table costs the same to render as a page of the
+tax-year table.
+"""
+import numpy as np
+import pandas as pd
+
+
+BREAKDOWN_VIEWS = ['Tax Year', 'Monthly', 'Daily']
+
+# Column prefix for each scenario
+SCENARIO_PREFIXES = {
+    'Best Rate': 'Best',
+    'Average Rate': 'Avg',
+    'Lowest Rate': 'Low',
+    'Custom Rate': 'Cust',
+}
+
+
+def _float_column(df, column):
+    return np.asarray(df[column].to_numpy(), dtype=float)
+
+
+def _period_keys(dates, view):
+    """Integer key per day identifying its tax year, month or day."""
+    years = dates.year.to_numpy()
+    months = dates.month.to_numpy()
+    if view == 'Tax Year':
+        # Tax year starts on 6 April
+        before_april_6 = (months < 4) | ((months == 4) & (dates.day.to_numpy() < 6))
+        return years - before_april_6
+    if view == 'Monthly':
+        return years * 12 + months - 1
+    return np.arange(len(dates))
+
+
+def period_end_positions(dates, view):
+    """
+    Row positions of the last day of each tax year, month or day, and the
+    period keys for those rows.
+    """
+    dates = pd.DatetimeIndex(dates)
+    keys = _period_keys(dates, view)
+    last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+    return last, keys[last]
+
+
+def period_labels(keys, view, dates):
+    """Display labels ('2005/2006', '2005-03', '2005-03-01') for period keys."""
+    if view == 'Tax Year':
+        return [f"{k}/{k + 1}" for k in keys]
+    if view == 'Monthly':
+        return [f"{k // 12}-{k % 12 + 1:02d}" for k in keys]
+    return dates.strftime('%Y-%m-%d')
+
+
+def build_breakdown(results, view='Tax Year', inflation_type='None'):
+    """
+    One row per tax year, month or day, with each scenario's real balance and
+    rate at the end of the period, the inflation rate and the total invested.
+
+    `results` maps scenario names ('Best Rate', 'Average Rate', ...) to frames
+    from calculate_portfolio_growth that share the same dates. All values are
+    floats rounded to 2 decimal places.
+    """
+    first = next(iter(results.values()))
+    dates = pd.DatetimeIndex(first['Date'])
+
+    # Last and first day of each period
+    last, keys = period_end_positions(dates, view)
+    first_pos = np.append(0, last[:-1] + 1)
+
+    columns = {}
+    for name, df in results.items():
+        prefix = SCENARIO_PREFIXES.get(name, name)
+        columns[f'{prefix} Balance'] = _float_column(df, 'Real Balance')[last]
+        columns[f'{prefix} Rate %'] = _float_column(df, 'Rate')[last]
+
+    if inflation_type != 'None':
+        if view == 'Tax Year':
+            # Effective rate over the tax year: (EndIndex / StartIndex) - 1
+            index = _float_column(first, 'Inflation Index')
+            columns[f'{inflation_type} %'] = (index[last] / index[first_pos] - 1) * 100
+        else:
+            # Months and days are too short for an effective rate, so show the
+            # annual rate in force, which compares directly with interest rates
+            columns[f'{inflation_type} %'] = _float_column(first, 'Inflation Rate')[last]
+
+    columns['Total Invested'] = _float_column(first, 'Total Invested')[last]
+
+    index = pd.Index(period_labels(keys, view, dates[last]), name=view if view != 'Daily' else 'Date')
+    return pd.DataFrame(columns, index=index).round(2)
+
+
+def page_count(df, page_size):
+    return max(1, -(-len(df) // page_size))
+
+
+def get_page(df, page, page_size):
+    """Rows for a 1-based page number."""
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def _highlight_underperformance(df, inflation_col):
+    """
+    CSS per cell, whole columns at a time: balances below the total invested,
+    and rates below inflation, are shown in red.
+    """
+    css = pd.DataFrame('', index=df.index, columns=df.columns)
+    red = np.array('color: red', dtype=object)
+    blank = np.array('', dtype=object)
+
+    invested = df['Total Invested'].to_numpy() if 'Total Invested' in df.columns else None
+    inflation = df[inflation_col].to_numpy() if inflation_col in df.columns else None
+
+    for col in df.columns:
+        if invested is not None and col.endswith(' Balance'):
+            css[col] = np.where(df[col].to_numpy() < invested, red, blank)
+        elif inflation is not None and col.endswith(' Rate %'):
+            css[col] = np.where(df[col].to_numpy() < inflation, red, blank)
+    return css
+
+
+def style_breakdown(page_df, inflation_type='None'):
+    """Styler for one page of a breakdown table: currency/percent formats, centred cells, red underperformance."""
+    inflation_col = f'{inflation_type} %' if inflation_type != 'None' else None
+
+    format_dict = {}
+    for col in page_df.columns:
+        if col.endswith(' Balance') or col == 'Total Invested':
+            format_dict[col] = '£{:,.2f}'
+        elif col.endswith(' %'):
+            format_dict[col] = '{:.2f}%'
+
+    # Center headers
+    styles = [
+        dict(selector="th", props=[("text-align", "center")]),
+        dict(selector="td", props=[("text-align", "center")])
+    ]
+
+    return (page_df.style
+            .format(format_dict)
+            .set_table_styles(styles)
+            .apply(_highlight_underperformance, axis=None, inflation_col=inflation_col))
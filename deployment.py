@@ -0,0 +1,197 @@
+"""
+Helpers for hosting the app for many concurrent users.
+
+Shared mode is switched on with the ISA_DEPLOYMENT=shared environment variable.
+In that mode simulations run on one bounded worker pool per process instead of
+on each session's script thread, and every session keeps its results in a
+store with a memory cap.
+
+Settings (environment variables):
+    ISA_DEPLOYMENT          'shared' to enable the worker pool (default: 'local')
+    ISA_WORKERS             worker threads in the pool (default: 4)
+    ISA_MAX_QUEUED          jobs waiting across all sessions (default: 64)
+    ISA_MAX_QUEUED_SESSION  jobs waiting for one session (default: 8)
+    ISA_SESSION_RESULT_MB   result memory kept per session (default: 64)
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def is_shared_mode():
+    """True when the app should run simulations on the shared worker pool."""
+    return os.environ.get('ISA_DEPLOYMENT', 'local').strip().lower() == 'shared'
+
+
+class PoolBusy(Exception):
+    """Raised when the worker pool queue (global or per session) is full."""
+
+
+class SessionFairPool:
+    """
+    Bounded thread pool that serves sessions round-robin.
+
+    Each session has its own FIFO queue. Workers take one job from the next
+    session in turn, so one user submitting many heavy runs cannot starve the
+    others. Queue lengths are capped globally and per session; submit raises
+    PoolBusy when a cap is hit.
+    """
+
+    def __init__(self, max_workers=4, max_queued=64, max_queued_per_session=8):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_queued_per_session = max_queued_per_session
+
+        self._queues = OrderedDict()  # session_id -> deque of (future, fn, args, kwargs)
+        self._queued = 0
+        self._lock = threading.Condition()
+        self._workers = []
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) for a session and returns its Future."""
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(session_id)
+            if self._queued >= self.max_queued:
+                raise PoolBusy("The server is busy, please try again in a moment.")
+            if queue is not None and len(queue) >= self.max_queued_per_session:
+                raise PoolBusy("Too many calculations queued for this session.")
+
+            if queue is None:
+                queue = self._queues[session_id] = deque()
+            queue.append((future, fn, args, kwargs))
+            self._queued += 1
+
+            # Start workers lazily, up to the limit
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"isa-worker-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+            self._lock.notify()
+        return future
+
+    def cancel_session(self, session_id):
+        """Drops a session's queued jobs. Jobs already running are left alone."""
+        with self._lock:
+            queue = self._queues.pop(session_id, None)
+            if not queue:
+                return 0
+            self._queued -= len(queue)
+        for future, _, _, _ in queue:
+            future.cancel()
+        return len(queue)
+
+    def queued(self):
+        """Number of jobs waiting for a worker."""
+        with self._lock:
+            return self._queued
+
+    def _next_job(self):
+        with self._lock:
+            while not self._queues:
+                self._lock.wait()
+
+            # Take from the session at the front, then move it to the back
+            session_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            return job
+
+    def _work(self):
+        while True:
+            future, fn, args, kwargs = self._next_job()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_shared_pool():
+    """Returns the process-wide pool, configured from the environment on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionFairPool(
+                max_workers=_env_int('ISA_WORKERS', 4),
+                max_queued=_env_int('ISA_MAX_QUEUED', 64),
+                max_queued_per_session=_env_int('ISA_MAX_QUEUED_SESSION', 8),
+            )
+        return _pool
+
+
+def _estimate_bytes(value):
+    """Rough memory footprint of a result (DataFrames, containers of them, scalars)."""
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(value, dict):
+        return sum(_estimate_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SessionResultStore:
+    """
+    Per-session LRU cache of calculation results with a memory cap.
+
+    Least recently used results are evicted once the total estimated size goes
+    over max_bytes. A single result larger than the cap is not kept at all.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = _env_int('ISA_SESSION_RESULT_MB', 64) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (result, size)
+        self.total_bytes = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key][0]
+
+    def put(self, key, result):
+        """Stores a result, evicting older ones to stay under the cap. Returns True if kept."""
+        self.discard(key)
+        size = _estimate_bytes(result)
+        if size > self.max_bytes:
+            return False
+
+        self._items[key] = (result, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, old_size) = self._items.popitem(last=False)
+            self.total_bytes -= old_size
+        return True
+
+    def discard(self, key):
+        if key in self._items:
+            _, size = self._items.pop(key)
+            self.total_bytes -= size
@@ -0,0 +1,277 @@
+"""
+Event-driven simulation of several ISA accounts sharing one annual allowance.
+
+Deposits, withdrawals and transfers between accounts are processed in date
+order from a heap, together with the engine's own events: tax-year starts
+(allowance reset), interest payouts and rate changes. An account is only
+brought up to date when one of its events comes up, and interest between two
+events is applied in closed form, so the run time grows with the number of
+events rather than with days x accounts.
+
+Interest follows the same rules as calculate_portfolio_growth: each day
+accrues balance x annual rate / 365 into pending interest, which is added to
+the balance on payout days (every day for 'Daily') and on the last day of the
+simulation. A deposit on a payout day is added after that day's payout.
+
+Allowance rules:
+  - Deposits count against the tax year's allowance, which all accounts
+    share. Anything over the remaining allowance is not paid in.
+  - Money withdrawn from a flexible account can be paid back into that
+    account in the same tax year without using allowance.
+  - Transfers between accounts don't use allowance. Interest accrued but not
+    yet paid stays with the source account until its next payout.
+"""
+import heapq
+import numpy as np
+import pandas as pd
+from decimal import Decimal
+
+from isa_calculator import CashflowSchedule, _as_decimal, _rate_indexes
+
+
+EVENT_KINDS = ['Deposit', 'Withdrawal', 'Transfer']
+
+# Same-day processing order: rate changes and new tax years apply from the
+# start of the day, payouts at the end of the day's accrual, user events last
+_RATE_CHANGE, _TAX_YEAR, _PAYOUT, _USER = 0, 0, 1, 2
+
+
+class Account:
+    """
+    One ISA account.
+
+    `rate_type` names the rate column to use, from `rate_periods` if given
+    (see calculate_portfolio_growth) or else from the tax-year rates table.
+    `interest_freq` is 'Daily', 'Monthly', 'Quarterly' or
+    'Annually (Tax Year End)'. `flexible` allows withdrawn money to be paid
+    back in the same tax year without using allowance.
+    """
+
+    def __init__(self, name, rate_type='Best Rate', interest_freq='Daily', flexible=False, rate_periods=None):
+        self.name = name
+        self.rate_type = rate_type
+        self.interest_freq = interest_freq
+        self.flexible = flexible
+        self.rate_periods = rate_periods
+
+
+class AccountEvent:
+    """
+    A deposit into, withdrawal from, or transfer out of `account`.
+
+    Transfers also name `to_account`. Amounts are in pounds and must be
+    positive. Withdrawals and transfers are limited to the account's balance.
+    """
+
+    def __init__(self, kind, date, account, amount, to_account=None):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind '{kind}', expected one of {EVENT_KINDS}")
+        if kind == 'Transfer' and to_account is None:
+            raise ValueError("Transfer events need a to_account")
+        amount = _as_decimal(amount)
+        if amount <= 0:
+            raise ValueError(f"Event amounts must be positive, got {amount}")
+        self.kind = kind
+        self.date = date
+        self.account = account
+        self.amount = amount
+        self.to_account = to_account
+
+
+class _AccountState:
+    """Balance of one account, brought up to date lazily."""
+
+    def __init__(self, account, start_day, rate_index):
+        self.account = account
+        self.rate_index = rate_index
+        self.balance = Decimal(0)
+        self.pending_interest = Decimal(0)
+        # Daily rate per period, with a trailing 0 so index -1 means "no rate"
+        self.daily_rates = [Decimal(float(r)) / 100 / 365 for r in rate_index.periods[account.rate_type]] + [Decimal(0)]
+        # Rate in force on the first day; later changes come as events
+        self.daily_rate = self.daily_rates[rate_index.locate(pd.to_datetime([start_day], unit='D'))[0]]
+        # Last day whose interest has been accrued
+        self.day = start_day - 1
+        # Withdrawn this tax year from a flexible account, can be paid back in
+        self.replaceable = Decimal(0)
+
+    def advance(self, through_day):
+        """Accrues interest for the days after self.day up to and including through_day."""
+        days = through_day - self.day
+        if days <= 0:
+            return
+        if self.account.interest_freq == 'Daily':
+            # Paid every day: compounds daily
+            self.balance *= (1 + self.daily_rate) ** days
+        else:
+            # No payout in between (payouts are events), so the balance is constant
+            self.pending_interest += self.balance * self.daily_rate * days
+        self.day = through_day
+
+    def pay_interest(self):
+        self.balance += self.pending_interest
+        self.pending_interest = Decimal(0)
+
+
+def _days(dates):
+    """Dates as integer day numbers (days since 1970-01-01)."""
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype('int64')
+
+
+def _period_boundaries(index, first_day, last_day):
+    """
+    Days in (first_day, last_day] where the period covering the day changes,
+    with the row position in force from that day (-1 for none).
+    """
+    starts = index.starts.astype('datetime64[D]').astype('int64')
+    ends = index.ends.astype('datetime64[D]').astype('int64')
+    candidates = np.concatenate([starts, ends + 1])
+    candidates = np.unique(candidates[(candidates > first_day) & (candidates <= last_day)])
+    if len(candidates) == 0:
+        return []
+    rows = index.locate(candidates.astype('datetime64[D]'))
+    return list(zip(candidates.tolist(), rows.tolist()))
+
+
+def _payout_days(interest_freq, first_day, last_day):
+    """Payout days for non-daily interest, excluding the final day (always paid)."""
+    if interest_freq == 'Daily':
+        return []
+    dates = pd.to_datetime([first_day, last_day], unit='D')
+    schedule = CashflowSchedule(dates[0], dates[1], interest_freq=interest_freq)
+    return [first_day + int(i) for i in schedule.payout_mask[:-1].nonzero()[0]]
+
+
+def simulate_events(accounts, events, start_date, end_date, custom_rates_df=None):
+    """
+    Runs deposits, withdrawals and transfers across several accounts.
+
+    `accounts` is a list of Account and `events` a list of AccountEvent; events
+    outside the period are ignored and same-day events run in list order.
+    Allowances come from the tax years in the rates table (`custom_rates_df`
+    if given).
+
+    Returns a ledger DataFrame with one row per event, plus a 'Close' row per
+    account on the end date: 'Date', 'Event', 'Account', 'To Account',
+    'Requested', 'Applied', 'Balance' (of 'Account' after the event),
+    'To Balance' and 'Allowance Remaining' (shared, for the tax year).
+    """
+    first_day, last_day = _days([start_date, end_date])
+    allowance_index, _ = _rate_indexes(custom_rates_df)
+
+    states = {
+        account.name: _AccountState(account, first_day, _rate_indexes(custom_rates_df, account.rate_periods)[1])
+        for account in accounts
+    }
+    if len(states) != len(accounts):
+        raise ValueError("Account names must be unique")
+
+    queue = []
+    seq = 0
+
+    def push(day, priority, kind, payload):
+        nonlocal seq
+        heapq.heappush(queue, (day, priority, seq, kind, payload))
+        seq += 1
+
+    # Allowance in force on the first day, then every tax-year change
+    allowances = [Decimal(int(a)) for a in allowance_index.periods['Allowance']]
+    first_row = allowance_index.locate(pd.to_datetime([first_day], unit='D'))[0]
+    allowance = allowances[first_row] if first_row >= 0 else Decimal(0)
+    subscribed = Decimal(0)
+    for day, row in _period_boundaries(allowance_index, first_day, last_day):
+        push(day, _TAX_YEAR, 'Tax Year', row)
+
+    # Per account: rate changes and payouts
+    for state in states.values():
+        account = state.account
+        for day, row in _period_boundaries(state.rate_index, first_day, last_day):
+            push(day, _RATE_CHANGE, 'Rate Change', (account.name, row))
+        for day in _payout_days(account.interest_freq, first_day, last_day):
+            push(day, _PAYOUT, 'Payout', account.name)
+
+    # User events
+    event_days = _days([event.date for event in events]) if events else []
+    for day, event in zip(event_days, events):
+        if first_day <= day <= last_day:
+            for name in (event.account, event.to_account):
+                if name is not None and name not in states:
+                    raise ValueError(f"Event refers to unknown account '{name}'")
+            push(int(day), _USER, event.kind, event)
+
+    ledger = []
+
+    def record(day, kind, name, requested, applied, to_name=None):
+        ledger.append({
+            'Date': day,
+            'Event': kind,
+            'Account': name,
+            'To Account': to_name,
+            'Requested': requested,
+            'Applied': applied,
+            'Balance': states[name].balance,
+            'To Balance': states[to_name].balance if to_name is not None else None,
+            'Allowance Remaining': max(Decimal(0), allowance - subscribed),
+        })
+
+    while queue:
+        day, _, _, kind, payload = heapq.heappop(queue)
+
+        if kind == 'Tax Year':
+            allowance = allowances[payload] if payload >= 0 else Decimal(0)
+            subscribed = Decimal(0)
+            for state in states.values():
+                state.replaceable = Decimal(0)
+
+        elif kind == 'Rate Change':
+            name, row = payload
+            state = states[name]
+            # The old rate applies up to the day before the change
+            state.advance(day - 1)
+            state.daily_rate = state.daily_rates[row]
+
+        elif kind == 'Payout':
+            state = states[payload]
+            state.advance(day)
+            state.pay_interest()
+
+        elif kind == 'Deposit':
+            state = states[payload.account]
+            state.advance(day)
+            replaceable = state.replaceable if state.account.flexible else Decimal(0)
+            applied = min(payload.amount, replaceable + max(Decimal(0), allowance - subscribed))
+            # Replacing flexible withdrawals comes first and uses no allowance
+            replaced = min(applied, replaceable)
+            state.replaceable -= replaced
+            subscribed += applied - replaced
+            state.balance += applied
+            record(day, kind, payload.account, payload.amount, applied)
+
+        elif kind == 'Withdrawal':
+            state = states[payload.account]
+            state.advance(day)
+            applied = min(payload.amount, state.balance)
+            state.balance -= applied
+            if state.account.flexible:
+                state.replaceable += applied
+            record(day, kind, payload.account, payload.amount, applied)
+
+        elif kind == 'Transfer':
+            source = states[payload.account]
+            target = states[payload.to_account]
+            source.advance(day)
+            target.advance(day)
+            applied = min(payload.amount, source.balance)
+            source.balance -= applied
+            target.balance += applied
+            record(day, kind, payload.account, payload.amount, applied, payload.to_account)
+
+    # Always pay on the very last day of simulation to capture accrued interest
+    for name, state in states.items():
+        state.advance(last_day)
+        state.pay_interest()
+        record(last_day, 'Close', name, None, None)
+
+    df = pd.DataFrame(ledger, columns=['Date', 'Event', 'Account', 'To Account', 'Requested', 'Applied', 'Balance', 'To Balance', 'Allowance Remaining'])
+    df['Date'] = pd.to_datetime(df['Date'], unit='D')
+    return df
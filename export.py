@@ -0,0 +1,184 @@
+"""
+Export of simulation results to CSV, Parquet or Excel.
+
+All scenarios are written to one long table (a 'Scenario' column), at daily,
+monthly or tax-year granularity. Each column is converted once to a typed
+numpy array, and the file is written in chunks from slices of those arrays, so
+no full object-dtype DataFrame is built along the way.
+
+Money columns are rounded half-up to whole pence from the exact Decimal values
+in every format, so a CSV, a Parquet file and an Excel sheet of the same
+results agree to the penny.
+
+Parquet needs pyarrow (installed with streamlit) and Excel needs openpyxl.
+"""
+import io
+import os
+import numpy as np
+import pandas as pd
+from decimal import Decimal, ROUND_HALF_UP
+
+from breakdown import period_end_positions, period_labels
+
+
+EXPORT_FORMATS = ['CSV', 'Parquet', 'Excel']
+EXPORT_GRANULARITIES = ['Daily', 'Monthly', 'Tax Year']
+
+MONEY_COLUMNS = ['Balance', 'Real Balance', 'Total Invested', 'Interest Earned']
+# Other numeric columns and the decimal places they are written with
+RATE_COLUMNS = {'Rate': 4, 'Inflation Index': 6, 'Inflation Rate': 4}
+
+FILE_EXTENSIONS = {'CSV': 'csv', 'Parquet': 'parquet', 'Excel': 'xlsx'}
+MIME_TYPES = {
+    'CSV': 'text/csv',
+    'Parquet': 'application/vnd.apache.parquet',
+    'Excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def to_pence(values):
+    """Rounds Decimal (or numeric) money values half-up to whole pence, as an int64 array."""
+    return np.fromiter(
+        (int((Decimal(v) * 100).to_integral_value(rounding=ROUND_HALF_UP)) for v in values),
+        dtype=np.int64, count=len(values),
+    )
+
+
+def _typed_columns(df, granularity):
+    """Typed arrays for the rows of one scenario at the requested granularity."""
+    dates = pd.DatetimeIndex(df['Date'])
+    positions, keys = period_end_positions(dates, granularity)
+
+    columns = {'Date': dates[positions].to_numpy(dtype='datetime64[ns]')}
+    if granularity != 'Daily':
+        columns['Period'] = np.asarray(period_labels(keys, granularity, dates[positions]), dtype=object)
+    for col in MONEY_COLUMNS:
+        columns[col] = to_pence(df[col].to_numpy()[positions])
+    for col, places in RATE_COLUMNS.items():
+        columns[col] = np.round(np.asarray(df[col].to_numpy()[positions], dtype=float), places)
+    return columns
+
+
+def _chunks(results, granularity, chunk_rows):
+    """Yields (scenario, dict of array slices) chunks of at most chunk_rows rows."""
+    for scenario, df in results.items():
+        columns = _typed_columns(df, granularity)
+        n_rows = len(columns['Date'])
+        for start in range(0, n_rows, chunk_rows):
+            yield scenario, {col: arr[start:start + chunk_rows] for col, arr in columns.items()}
+
+
+def _column_order(granularity):
+    period = [] if granularity == 'Daily' else ['Period']
+    return ['Scenario', 'Date'] + period + MONEY_COLUMNS + list(RATE_COLUMNS)
+
+
+def _pounds(pence):
+    """Pence to pounds, as floats that print exactly to 2 decimal places."""
+    return pence / 100
+
+
+def _write_csv(chunks, target, columns):
+    text = io.TextIOWrapper(target, encoding='utf-8', newline='') if _is_binary(target) else target
+    try:
+        text.write(','.join(columns) + '\n')
+        for scenario, chunk in chunks:
+            out = {'Scenario': np.full(len(chunk['Date']), scenario, dtype=object)}
+            out['Date'] = np.datetime_as_string(chunk['Date'], unit='D')
+            if 'Period' in chunk:
+                out['Period'] = chunk['Period']
+            for col in MONEY_COLUMNS:
+                # Format from the integer pence so every value has exactly 2 decimals
+                out[col] = np.char.mod('%.2f', _pounds(chunk[col]))
+            for col, places in RATE_COLUMNS.items():
+                out[col] = np.char.mod(f'%.{places}f', chunk[col])
+            pd.DataFrame(out, columns=columns).to_csv(text, header=False, index=False)
+    finally:
+        if text is not target:
+            text.flush()
+            text.detach()
+
+
+def _write_parquet(chunks, target, columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow).")
+
+    fields = [('Scenario', pa.string()), ('Date', pa.date32())]
+    if 'Period' in columns:
+        fields.append(('Period', pa.string()))
+    fields += [(col, pa.float64()) for col in MONEY_COLUMNS]
+    fields += [(col, pa.float64()) for col in RATE_COLUMNS]
+    schema = pa.schema(fields)
+
+    writer = pq.ParquetWriter(target, schema)
+    try:
+        for scenario, chunk in chunks:
+            arrays = [
+                pa.array(np.full(len(chunk['Date']), scenario, dtype=object), pa.string()),
+                pa.array(chunk['Date'].astype('datetime64[D]'), pa.date32()),
+            ]
+            if 'Period' in chunk:
+                arrays.append(pa.array(chunk['Period'], pa.string()))
+            arrays += [pa.array(_pounds(chunk[col])) for col in MONEY_COLUMNS]
+            arrays += [pa.array(chunk[col]) for col in RATE_COLUMNS]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        writer.close()
+
+
+def _write_excel(chunks, target, columns, sheet_name):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("Excel export needs openpyxl (pip install openpyxl).")
+
+    # Write-only mode streams rows out instead of keeping every cell in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(columns)
+    for scenario, chunk in chunks:
+        rows = [chunk['Date'].astype('datetime64[D]').tolist()]
+        if 'Period' in chunk:
+            rows.append(chunk['Period'].tolist())
+        rows += [_pounds(chunk[col]).tolist() for col in MONEY_COLUMNS]
+        rows += [chunk[col].tolist() for col in RATE_COLUMNS]
+        for row in zip(*rows):
+            sheet.append((scenario,) + row)
+    workbook.save(target)
+
+
+def _is_binary(target):
+    return isinstance(target, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(target, 'mode', '')
+
+
+def export_results(results, target, fmt='CSV', granularity='Daily', chunk_rows=50_000):
+    """
+    Writes the results of every scenario to `target`.
+
+    `results` maps scenario names to frames from calculate_portfolio_growth.
+    `target` is a file path or a binary file object (a text file object also
+    works for CSV). `fmt` is 'CSV', 'Parquet' or 'Excel' and `granularity` is
+    'Daily', 'Monthly' or 'Tax Year'; monthly and tax-year rows are the last
+    day of each period. Data is written `chunk_rows` rows at a time.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    if granularity not in EXPORT_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {EXPORT_GRANULARITIES}")
+
+    columns = _column_order(granularity)
+    chunks = _chunks(results, granularity, chunk_rows)
+
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'wb') as f:
+            return export_results(results, f, fmt, granularity, chunk_rows)
+
+    if fmt == 'CSV':
+        _write_csv(chunks, target, columns)
+    elif fmt == 'Parquet':
+        _write_parquet(chunks, target, columns)
+    else:
+        _write_excel(chunks, target, columns, granularity)
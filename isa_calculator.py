@@ -1,50 +1,311 @@
-import pandas as pd
-from datetime import datetime, timedelta
+import heapq
+import numpy as np
+from datetime import datetime
+from functools import lru_cache
 from rates_data import ISA_RATES
 from inflation_data import INFLATION_RATES
 from decimal import Decimal
 
+# pandas is imported inside the functions that need it rather than here: it is
+# the slowest import in the app, and deferring it lets the page render before
+# the first calculation.
 
-def get_rates_df():
-    """Converts the rates list to a DataFrame and parses dates."""
+
+@lru_cache(maxsize=None)
+def _shared_rates_df():
+    """Parsed rates table, built once per process and shared read-only."""
+    import pandas as pd
     df = pd.DataFrame(ISA_RATES)
     df['Start Date'] = pd.to_datetime(df['Start Date'])
     df['End Date'] = pd.to_datetime(df['End Date'])
     return df
 
+@lru_cache(maxsize=None)
+def _shared_inflation_map(inflation_type):
+    """Year -> annual inflation (%) for one series, built once per process."""
+    if inflation_type == 'None':
+        return {}
+    return get_inflation_df().set_index('Year')[inflation_type].to_dict()
+
+def _daily_inflation_factor(annual_inflation):
+    # Fix TypeError: Decimal ** float is not supported. Use Decimal for exponent.
+    return (1 + annual_inflation / 100) ** (Decimal(1)/Decimal(365))
+
+@lru_cache(maxsize=None)
+def _shared_inflation_factors(inflation_type):
+    """
+    Year -> (annual inflation, daily index factor) as Decimals for one series.
+
+    The Decimal power behind each daily factor is the most expensive step in the
+    daily loop, so it is done once per year of data per process.
+    """
+    # inflation_map values are likely floats from pandas, so cast to float first
+    factors = {}
+    for year, val in _shared_inflation_map(inflation_type).items():
+        annual_inflation = Decimal(float(val))
+        factors[year] = (annual_inflation, _daily_inflation_factor(annual_inflation))
+    return factors
+
+def _float_inflation_index(dates, inflation_type):
+    """
+    Daily inflation index for `dates` as a float array, from the same daily
+    factors as the Decimal index in the calculator. For the array engines.
+    """
+    years = np.asarray(dates.year)
+    daily = np.ones(len(years))
+    # Years missing from the data count as zero inflation
+    for year, (_, daily_factor) in _shared_inflation_factors(inflation_type).items():
+        daily[years == year] = float(daily_factor)
+    return np.cumprod(daily)
+
+def get_rates_df():
+    """Converts the rates list to a DataFrame and parses dates."""
+    # Callers are free to modify the result, so hand out a copy of the shared table
+    return _shared_rates_df().copy()
+
 def get_inflation_df():
     """Converts inflation rates to DataFrame."""
+    import pandas as pd
     return pd.DataFrame(INFLATION_RATES)
 
-def calculate_portfolio_growth(initial_investment:Decimal, recurring_amount:Decimal, frequency:str, lump_sums:list, rate_type:str, start_date=None, end_date=None, inflation_type='None', interest_freq='Daily', custom_rates_df=None):
+class RatePeriodIndex:
+    """
+    Sorted-boundary index over dated periods (rate periods or tax years).
+
+    Takes a DataFrame (or list of dicts) with a 'Start Date' column, an
+    optional 'End Date' column and any value columns (e.g. 'Best Rate',
+    'Allowance' or one column per provider). A missing or blank end date means
+    the period runs until the next one starts. Where periods overlap, the one
+    that started most recently applies.
+
+    The periods are split up front into non-overlapping segments at every
+    start and every day after an end, each holding the period that applies
+    across it, so a period nested inside a longer one hands back to the longer
+    one when it ends. Lookups are a binary search over the segment starts for
+    a whole array of dates at once, so the cost per simulated day doesn't grow
+    with the number of periods.
+    """
+
+    def __init__(self, periods):
+        import pandas as pd
+        df = pd.DataFrame(periods)
+        df['Start Date'] = pd.to_datetime(df['Start Date'])
+        if 'End Date' in df.columns:
+            df['End Date'] = pd.to_datetime(df['End Date'])
+        else:
+            df['End Date'] = pd.NaT
+        self.periods = df.sort_values('Start Date', kind='stable').reset_index(drop=True)
+
+        self.starts = self.periods['Start Date'].to_numpy(dtype='datetime64[ns]')
+        ends = self.periods['End Date'].to_numpy(dtype='datetime64[ns]')
+        # Open-ended periods stop the day before the next one starts (the last runs forever)
+        next_starts = np.append(self.starts[1:] - np.timedelta64(1, 'D'), np.datetime64('NaT'))
+        ends = np.where(np.isnat(ends), next_starts, ends)
+        forever = np.datetime64(pd.Timestamp.max.floor('D'), 'ns')
+        self.ends = np.where(np.isnat(ends), forever, ends)
+
+        # Segment boundaries: every start, and the day after every end
+        day = np.timedelta64(1, 'D')
+        boundaries = np.unique(np.concatenate([self.starts, self.ends[self.ends < forever] + day]))
+        # Sweep the boundaries in order, keeping the periods covering the
+        # current day in a heap keyed on row position (later rows started
+        # later, or are listed later on the same start date)
+        rows = np.full(len(boundaries), -1, dtype=np.int64)
+        covering = []
+        next_row = 0
+        for k, boundary in enumerate(boundaries):
+            while next_row < len(self.starts) and self.starts[next_row] <= boundary:
+                heapq.heappush(covering, -next_row)
+                next_row += 1
+            while covering and self.ends[-covering[0]] < boundary:
+                heapq.heappop(covering)
+            if covering:
+                rows[k] = -covering[0]
+        self.segment_starts = boundaries
+        self.segment_rows = rows
+
+    def __len__(self):
+        return len(self.periods)
+
+    def locate(self, dates):
+        """Row position in `periods` covering each date, or -1 where no period applies."""
+        import pandas as pd
+        days = pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[ns]')
+        pos = np.searchsorted(self.segment_starts, days, side='right') - 1
+        return np.where(pos >= 0, self.segment_rows[np.maximum(pos, 0)], -1)
+
+@lru_cache(maxsize=None)
+def _shared_rates_index():
+    """Index over the built-in rates table, built once per process."""
+    return RatePeriodIndex(_shared_rates_df())
+
+class CashflowSchedule:
+    """
+    Cashflow calendar compiled once from the contribution and interest settings.
+
+    Holds the simulation dates, the sorted contribution events (day offset and
+    amount) and the interest payout mask, so the same schedule can be reused
+    across rate types, custom rates and inflation settings without redoing the
+    calendar logic on every call.
+    """
+
+    def __init__(self, start_date, end_date, frequency='None', recurring_amount=Decimal(0), lump_sums=(), initial_investment=Decimal(0), interest_freq='Daily'):
+        import pandas as pd
+        # Ensure frequency is a string to avoid TypeErrors with pd.NA or other types
+        self.frequency = str(frequency)
+        self.interest_freq = interest_freq
+        self.start_date = pd.Timestamp(start_date).date()
+        self.end_date = pd.Timestamp(end_date).date()
+
+        self.dates = pd.date_range(start=pd.Timestamp(self.start_date), end=pd.Timestamp(self.end_date), freq='D')
+        n_days = len(self.dates)
+
+        # Contributions keyed by day offset from the start date
+        amounts = {}
+
+        # Recurring payments
+        if self.frequency == 'Weekly':
+            # Every 7 days, starting one week after the start date
+            payment_days = range(7, n_days, 7)
+        elif self.frequency == 'Monthly':
+            # 1st of each month
+            payment_days = np.flatnonzero(self.dates.day == 1)
+        elif self.frequency == 'Annually':
+            # Start of Financial Year: April 6th
+            payment_days = np.flatnonzero((self.dates.month == 4) & (self.dates.day == 6))
+        else:
+            payment_days = []
+
+        recurring_amount = _as_decimal(recurring_amount)
+        for day in payment_days:
+            amounts[int(day)] = recurring_amount
+
+        # Lump sums
+        for date_str, amount in lump_sums:
+            try:
+                d = pd.to_datetime(date_str).date()
+                amount = _as_decimal(amount)
+            except:
+                continue
+            day = (d - self.start_date).days
+            if 0 <= day < n_days:
+                amounts[day] = amounts.get(day, Decimal(0)) + amount
+
+        # Initial Investment
+        initial_investment = _as_decimal(initial_investment)
+        if initial_investment > 0 and n_days > 0:
+            amounts[0] = amounts.get(0, Decimal(0)) + initial_investment
+
+        # Only days with something to deposit become events
+        event_days = sorted(day for day, amount in amounts.items() if amount > 0)
+        self.event_days = np.array(event_days, dtype=np.int64)
+        self.event_amounts = tuple(amounts[day] for day in event_days)
+
+        # Interest payout mask
+        if interest_freq == 'Daily':
+            payout = np.ones(n_days, dtype=bool)
+        elif interest_freq == 'Monthly':
+            payout = np.asarray(self.dates.is_month_end)
+        elif interest_freq == 'Quarterly':
+            payout = np.asarray(self.dates.is_quarter_end)
+        elif 'Annually' in interest_freq:
+            # Tax Year End (April 5)
+            payout = np.asarray((self.dates.month == 4) & (self.dates.day == 5))
+        else:
+            payout = np.zeros(n_days, dtype=bool)
+        payout = payout.copy()
+
+        # Always pay on the very last day of simulation to capture accrued interest
+        if n_days > 0:
+            payout[-1] = True
+        self.payout_mask = payout
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def _as_decimal(value):
+    """Converts ints, floats and strings to Decimal without binary float noise."""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return Decimal(value)
+
+
+def _rate_indexes(custom_rates_df=None, rate_periods=None):
+    """Allowance (tax year) index and rate index for a simulation."""
+    if custom_rates_df is not None:
+        allowance_index = RatePeriodIndex(custom_rates_df)
+    else:
+        allowance_index = _shared_rates_index()
+
+    if rate_periods is None:
+        rate_index = allowance_index
+    elif isinstance(rate_periods, RatePeriodIndex):
+        rate_index = rate_periods
+    else:
+        rate_index = RatePeriodIndex(rate_periods)
+    return allowance_index, rate_index
+
+def _prepare_simulation(initial_investment, recurring_amount, frequency, lump_sums, start_date, end_date, interest_freq, custom_rates_df, schedule):
+    """Compiles the cashflow schedule if one wasn't given, defaulting to the rates table's date range."""
+    if schedule is None:
+        rates_df = custom_rates_df if custom_rates_df is not None else _shared_rates_df()
+        # Define date range
+        if start_date is None:
+            start_date = rates_df['Start Date'].min().date()
+        if end_date is None:
+            end_date = rates_df['End Date'].max().date()
+
+        schedule = CashflowSchedule(start_date, end_date, frequency, recurring_amount, lump_sums, initial_investment, interest_freq)
+    return schedule
+
+def calculate_portfolio_growth(initial_investment:Decimal, recurring_amount:Decimal, frequency:str, lump_sums:list, rate_type:str, start_date=None, end_date=None, inflation_type='None', interest_freq='Daily', custom_rates_df=None, schedule=None, rate_periods=None):
     """
     Calculates the daily balance of the portfolio, respecting ISA allowances.
     Optionally adjusts for inflation (Real Value).
     Handles different interest payment frequencies.
+
+    A precompiled CashflowSchedule can be passed as `schedule` to reuse the same
+    cashflows across rate types; the contribution, date and interest frequency
+    arguments are then taken from the schedule instead.
+
+    Interest rates normally come from the tax-year rates table. `rate_periods`
+    (a DataFrame, list of dicts or RatePeriodIndex of dated rate periods with a
+    `rate_type` column) overrides them, allowing rate changes within a tax year.
+    Allowances still follow the tax years in the rates table.
     """
-    if custom_rates_df is not None:
-        rates_df = custom_rates_df
-    else:
-        rates_df = get_rates_df()
-        
-    # Ensure frequency is a string to avoid TypeErrors with pd.NA or other types
-    frequency = str(frequency)
-        
-    inflation_df = get_inflation_df()
-    
-    # Define date range
-    if start_date is None:
-        start_date = rates_df['Start Date'].min().date()
-    if end_date is None:
-        end_date = rates_df['End Date'].max().date()
-        
-    start_ts = pd.Timestamp(start_date)
-    end_ts = pd.Timestamp(end_date)
-    
-    date_range = pd.date_range(start=start_ts, end=end_ts, freq='D')
-    
+    import pandas as pd
+    schedule = _prepare_simulation(initial_investment, recurring_amount, frequency, lump_sums, start_date, end_date, interest_freq, custom_rates_df, schedule)
+
+    records = []
+    allowance_index, rate_index = _rate_indexes(custom_rates_df, rate_periods)
+    for chunk in _simulate_records(rate_type, inflation_type, allowance_index, rate_index, schedule):
+        records.extend(chunk)
+    return pd.DataFrame(records)
+
+def iter_portfolio_growth(initial_investment:Decimal, recurring_amount:Decimal, frequency:str, lump_sums:list, rate_type:str, start_date=None, end_date=None, inflation_type='None', interest_freq='Daily', custom_rates_df=None, schedule=None, rate_periods=None):
+    """
+    Same calculation as calculate_portfolio_growth, yielded one tax year at a time.
+
+    Each item is a DataFrame with that tax year's daily rows (the first and last
+    chunks may be partial years). Concatenating all chunks gives the same frame
+    as calculate_portfolio_growth. Stop iterating to cancel the calculation.
+    """
+    import pandas as pd
+    schedule = _prepare_simulation(initial_investment, recurring_amount, frequency, lump_sums, start_date, end_date, interest_freq, custom_rates_df, schedule)
+
+    allowance_index, rate_index = _rate_indexes(custom_rates_df, rate_periods)
+    for chunk in _simulate_records(rate_type, inflation_type, allowance_index, rate_index, schedule):
+        yield pd.DataFrame(chunk)
+
+def _simulate_records(rate_type, inflation_type, allowance_index, rate_index, schedule):
+    """Runs the daily simulation, yielding the list of daily records for each tax year."""
     # Build Inflation Index
-    inflation_map = inflation_df.set_index('Year')[inflation_type].to_dict() if inflation_type != 'None' else {}
+    inflation_factors = _shared_inflation_factors(inflation_type)
+    # Years missing from the data count as zero inflation
+    no_inflation = (Decimal(0.0), _daily_inflation_factor(Decimal(0.0)))
     
     # Initialize variables
     balance = Decimal(0.0)
@@ -56,121 +317,64 @@ def calculate_portfolio_growth(initial_investment:Decimal, recurring_amount:Deci
     
     records = []
     
-    # Pre-process lump sums
-    lump_sum_map = {}
-    for date_str, amount in lump_sums:
-        try:
-            d = pd.to_datetime(date_str).date()
-            lump_sum_map[d] = lump_sum_map.get(d, 0) + amount
-        except:
-            pass
-
-    # Payment scheduling
-    next_payment_date = start_ts
-    if frequency == 'Weekly':
-        next_payment_date += timedelta(weeks=1)
-    elif frequency == 'Monthly':
-        next_payment_date += pd.DateOffset(months=1)
-    elif frequency == 'Annually':
-        next_payment_date += pd.DateOffset(years=1)
+    # Contribution events, consumed in date order
+    event_days = schedule.event_days
+    event_amounts = schedule.event_amounts
+    next_event = 0
+    next_event_day = event_days[0] if len(event_days) else -1
+    payout_mask = schedule.payout_mask
         
+    # Tax year and rate period covering each day (-1 for none), resolved up front
+    tax_year_of_day = allowance_index.locate(schedule.dates)
+    rate_period_of_day = rate_index.locate(schedule.dates)
+
+    allowances = [Decimal(int(a)) for a in allowance_index.periods['Allowance']]
+    # Daily rate per period, with a trailing 0 so index -1 means "no rate"
+    daily_rates = [Decimal(float(r)) / 100 / 365 for r in rate_index.periods[rate_type]] + [Decimal(0.0)]
+
     # Current tax year state
-    current_tax_year_idx = -1
+    current_tax_year_idx = -2
     current_allowance = Decimal(0.0)
     current_contributed = Decimal(0.0)
-    current_rate_daily = Decimal(0.0)
-    current_tax_year_end = pd.Timestamp.min
-    
-    # Initial Investment
-    if initial_investment > 0:
-        lump_sum_map[start_date] = lump_sum_map.get(start_date, 0) + initial_investment
 
-    for date in date_range:
+    for day, date in enumerate(schedule.dates):
         year = date.year
+
+        # Hand back the finished tax year before starting a new one (6 April)
+        if records and date.month == 4 and date.day == 6:
+            yield records
+            records = []
         
         # 1. Determine Tax Year & Interest Rate
-        if date > current_tax_year_end or current_tax_year_idx == -1:
-            mask = (rates_df['Start Date'] <= date) & (rates_df['End Date'] >= date)
-            if mask.any():
-                row = rates_df[mask].iloc[0]
-                current_allowance = Decimal(int(row['Allowance']))
-                current_rate_daily = Decimal(float(row[rate_type])) / 100 / 365
-                current_tax_year_end = row['End Date']
-                current_contributed = Decimal(0) 
-                current_tax_year_idx = 1
-            else:
-                current_allowance = Decimal(0)
-                current_rate_daily = Decimal(0.0)
-                current_tax_year_end = date
-                current_contributed = Decimal(0)
+        tax_year_idx = tax_year_of_day[day]
+        if tax_year_idx != current_tax_year_idx or tax_year_idx == -1:
+            # New tax year (days outside the table have no allowance)
+            current_allowance = allowances[tax_year_idx] if tax_year_idx >= 0 else Decimal(0)
+            current_contributed = Decimal(0)
+            current_tax_year_idx = tax_year_idx
+        current_rate_daily = daily_rates[rate_period_of_day[day]]
 
         # 2. Update Inflation Index
         annual_inflation = Decimal(0.0)
         if inflation_type != 'None':
-            # inflation_map values are likely floats from pandas, so cast to float first
-            val = inflation_map.get(year, 0.0)
-            annual_inflation = Decimal(float(val))
-            
-            # Fix TypeError: Decimal ** float is not supported. Use Decimal for exponent.
-            daily_inflation_factor = (1 + annual_inflation / 100) ** (Decimal(1)/Decimal(365))
+            annual_inflation, daily_inflation_factor = inflation_factors.get(year, no_inflation)
             current_inflation_index *= daily_inflation_factor
 
         # 3. Apply Interest (Accumulate Pending)
         daily_interest = balance * current_rate_daily
         pending_interest += daily_interest
         
-        # Check if interest should be paid (compounded)
-        pay_interest = False
-        if interest_freq == 'Daily':
-            pay_interest = True
-        elif interest_freq == 'Monthly' and date.is_month_end:
-            pay_interest = True
-        elif interest_freq == 'Quarterly' and date.is_quarter_end:
-            pay_interest = True
-        elif 'Annually' in interest_freq:
-            # Tax Year End (April 5)
-            if date.month == 4 and date.day == 5:
-                pay_interest = True
-        
-        # Always pay on the very last day of simulation to capture accrued interest
-        if date == end_ts:
-            pay_interest = True
-            
-        if pay_interest:
+        # Pay (compound) interest on the schedule's payout days
+        if payout_mask[day]:
             balance += pending_interest
             pending_interest = Decimal(0.0)
         
-        # 4. Determine potential contribution
-        potential_contribution = Decimal(0.0)
-        
-        # Recurring
-        is_payment_day = False
-        if frequency == 'Weekly':
-             # Keep interval logic for weekly? 
-             # Or align to Monday? User didn't specify. 
-             # Let's keep existing logic -> if date == next_payment_date.date()
-             # NOTE: next_payment_date is initialized to start_date.
-             if date.date() == next_payment_date.date():
-                 is_payment_day = True
-                 next_payment_date += timedelta(weeks=1)
-        elif frequency == 'Monthly':
-            # 1st of each month
-            if date.day == 1:
-                is_payment_day = True
-        elif frequency == 'Annually':
-            # Start of Financial Year: April 6th
-            if date.month == 4 and date.day == 6:
-                is_payment_day = True
-                
-        if frequency != 'None' and is_payment_day:
-            potential_contribution += recurring_amount
-                
-        # Lump Sums
-        if date.date() in lump_sum_map:
-            potential_contribution += lump_sum_map[date.date()]
-            
-        # 5. Check Allowance and Deposit
-        if potential_contribution > 0:
+        # 4. Check Allowance and Deposit
+        if day == next_event_day:
+            potential_contribution = event_amounts[next_event]
+            next_event += 1
+            next_event_day = event_days[next_event] if next_event < len(event_days) else -1
+
             remaining_allowance = max(Decimal(0.0), current_allowance - current_contributed)
             actual_deposit = min(potential_contribution, remaining_allowance)
             
@@ -178,7 +382,7 @@ def calculate_portfolio_growth(initial_investment:Decimal, recurring_amount:Deci
             total_invested += actual_deposit
             current_contributed += actual_deposit
             
-        # 6. Calculate Real Values
+        # 5. Calculate Real Values
         # Real Value = Nominal Value / Index
         # This gives value in "Start Date Money" terms (if index started at 1.0)
         # Or we can just store the index and let the UI decide how to present?
@@ -201,4 +405,5 @@ def calculate_portfolio_growth(initial_investment:Decimal, recurring_amount:Deci
             'Inflation Rate': annual_inflation if inflation_type != 'None' else Decimal(0.0)
         })
         
-    return pd.DataFrame(records)
+    if records:
+        yield records
@@ -0,0 +1,142 @@
+"""
+Allowance-aware contribution optimiser.
+
+Given a fixed pot of money, chooses how much to pay in during each tax year
+(never more than that year's allowance) and on which day, so the final real
+balance is as large as possible. The result is a list of lump sums that can
+be passed straight to calculate_portfolio_growth.
+
+Balances grow linearly in the deposits (interest never depends on how much
+allowance is left), so the final value of a pound paid in on a given day is a
+fixed multiplier. The multipliers for every day come from one backward pass
+over the simulation period, and the split of the budget between tax years is
+then a dynamic programme over the tax years.
+"""
+import numpy as np
+import pandas as pd
+from decimal import Decimal, ROUND_FLOOR
+
+from isa_calculator import CashflowSchedule, _float_inflation_index, _rate_indexes, _shared_rates_df
+
+
+def contribution_multipliers(rate_type, start_date=None, end_date=None, inflation_type='None', interest_freq='Daily', custom_rates_df=None, rate_periods=None):
+    """
+    Value at the end date of £1 paid in on the best day of each tax year.
+
+    Returns a DataFrame with one row per tax year in the period: 'Tax Year',
+    'Date' (the best deposit day in the year), 'Allowance' and 'Multiplier'
+    (final real balance per pound deposited on that day). `rate_periods` works
+    as in calculate_portfolio_growth.
+    """
+    rates_df = custom_rates_df if custom_rates_df is not None else _shared_rates_df()
+    if start_date is None:
+        start_date = rates_df['Start Date'].min().date()
+    if end_date is None:
+        end_date = rates_df['End Date'].max().date()
+
+    schedule = CashflowSchedule(start_date, end_date, interest_freq=interest_freq)
+    dates = schedule.dates
+    allowance_index, rate_index = _rate_indexes(custom_rates_df, rate_periods)
+    row = allowance_index.locate(dates)
+    rate_row = rate_index.locate(dates)
+    annual = np.append(rate_index.periods[rate_type].to_numpy(dtype=float), 0.0)
+    rate = annual[rate_row] / 100 / 365
+    pay = schedule.payout_mask
+
+    # Backward pass: sensitivity of the final balance to the balance (a) and
+    # pending interest (p) at the end of each day. A deposit on day i is added
+    # after that day's interest, so its multiplier is a[i].
+    n = len(dates)
+    multiplier = np.zeros(n)
+    a, p = 1.0, 0.0
+    for i in range(n - 1, -1, -1):
+        multiplier[i] = a
+        if i == 0:
+            break
+        r = rate[i]
+        if pay[i]:
+            a, p = a * (1 + r), a
+        else:
+            a, p = a + p * r, p
+
+    # Real value at the end date
+    multiplier /= _float_inflation_index(dates, inflation_type)[-1]
+
+    tax_years = allowance_index.periods
+    plan = []
+    for tax_row in pd.unique(row[row >= 0]):
+        days = np.flatnonzero(row == tax_row)
+        best = days[np.argmax(multiplier[days])]
+        plan.append({
+            'Tax Year': tax_years['Tax Year'].iloc[tax_row] if 'Tax Year' in tax_years.columns else str(tax_row),
+            'Date': dates[best],
+            'Allowance': Decimal(int(tax_years['Allowance'].iloc[tax_row])),
+            'Multiplier': multiplier[best],
+        })
+    return pd.DataFrame(plan, columns=['Tax Year', 'Date', 'Allowance', 'Multiplier'])
+
+
+def _window_max(values, width):
+    """For each index b, the max of values[max(0, b - width + 1) .. b]."""
+    result = np.maximum.accumulate(values)
+    if width >= len(values):
+        return result
+
+    # Doubling: after the loop, spans[b] is the max over the `span` values ending at b
+    spans = values.copy()
+    span = 1
+    while span * 2 <= width:
+        spans[span:] = np.maximum(spans[span:], spans[:-span])
+        span *= 2
+
+    # Two overlapping spans cover each full window
+    result[width:] = np.maximum(spans[width:], spans[span:len(values) - width + span])
+    return result
+
+
+def optimize_contributions(budget:Decimal, rate_type:str, start_date=None, end_date=None, inflation_type='None', interest_freq='Daily', custom_rates_df=None, step=Decimal(1), rate_periods=None):
+    """
+    Splits a fixed budget across tax years to maximise the final real balance.
+
+    Contributions are whole multiples of `step` (£1 by default) and never exceed
+    a tax year's allowance. Returns a list of (date string, amount) lump sums
+    in date order, in the format calculate_portfolio_growth expects. Any budget
+    that can't be paid in within the allowances is left out.
+    """
+    budget = Decimal(budget)
+    step = Decimal(step)
+    plan = contribution_multipliers(rate_type, start_date, end_date, inflation_type, interest_freq, custom_rates_df, rate_periods)
+    if plan.empty or budget <= 0:
+        return []
+
+    units = int((budget / step).to_integral_value(rounding=ROUND_FLOOR))
+    caps = [int((allowance / step).to_integral_value(rounding=ROUND_FLOOR)) for allowance in plan['Allowance']]
+    # Budget beyond the total allowance can never be paid in, so the table
+    # only needs to cover what fits
+    units = min(units, sum(caps))
+    gains = plan['Multiplier'].to_numpy() * float(step)
+    n_years = len(plan)
+
+    # value[t][b]: best final value from tax years t.. with b units of budget left
+    #   value[t][b] = max over 0 <= c <= min(cap_t, b) of c * gain_t + value[t+1][b - c]
+    # Writing b' = b - c turns the inner max into a sliding-window max of
+    # (value[t+1][b'] - b' * gain_t), which _window_max does in O(budget log cap).
+    budget_units = np.arange(units + 1)
+    value = [None] * (n_years + 1)
+    value[n_years] = np.zeros(units + 1)
+    for t in range(n_years - 1, -1, -1):
+        shifted = value[t + 1] - budget_units * gains[t]
+        value[t] = budget_units * gains[t] + _window_max(shifted, caps[t] + 1)
+
+    # Walk forward, recovering the contribution chosen for each year
+    lump_sums = []
+    remaining = units
+    for t in range(n_years):
+        options = np.arange(min(caps[t], remaining) + 1)
+        totals = options * gains[t] + value[t + 1][remaining - options]
+        # Prefer the larger contribution on ties, leaving less for later years
+        chosen = int(options[len(options) - 1 - np.argmax(totals[::-1])])
+        if chosen > 0:
+            lump_sums.append((plan['Date'].iloc[t].strftime('%Y-%m-%d'), chosen * step))
+            remaining -= chosen
+    return lump_sums
@@ -150,15 +150,6 @@ def test_interest_frequency():
     assert 3195 < final_balance < 3196
     print("PASS")
 
-if __name__ == "__main__":
-    test_simple_interest()
-    # test_lump_sum() 
-    # test_date_range() 
-    # test_monthly_payments()
-    test_allowance_limit()
-    test_inflation()
-    test_interest_frequency()
-
 def test_fixed_inflation():
     print("\nTesting Fixed Inflation (2%)...")
     from datetime import datetime
@@ -177,8 +168,8 @@ def test_fixed_inflation():
     final_balance = res['Balance']
     final_real = res['Real Balance']
     
-    print(f"Final Balance: {final_balance:.2f}")
-    print(f"Final Real Balance: {final_real:.2f}")
+    print(f"Final Balance: £{final_balance:.2f}")
+    print(f"Final Real Balance: £{final_real:.2f}")
     
     # Check Inflation Index
     # 2 years of 2% inflation. Days = 366 (2020) + 365 (2021) = 731 days.
@@ -196,6 +187,486 @@ def test_fixed_inflation():
     assert abs(float(final_real) - expected_real) < 0.01, "Real balance mismatch"
     print("PASS")
 
+def test_rate_period_index():
+    print("\nTesting Rate Period Index (open-ended, gaps, overlap)...")
+    from isa_calculator import RatePeriodIndex
+
+    # Open-ended periods run until the next one starts; the last runs forever
+    index = RatePeriodIndex([
+        {'Start Date': '2020-06-01', 'Best Rate': 5.0},
+        {'Start Date': '2020-01-01', 'Best Rate': 2.0},
+    ])
+    rows = index.locate(pd.to_datetime(['2019-12-31', '2020-01-01', '2020-05-31', '2020-06-01', '2100-01-01']))
+    rates = [float(index.periods['Best Rate'].iloc[r]) if r >= 0 else None for r in rows]
+    print(f"Open-ended rates: {rates}")
+    assert rates == [None, 2.0, 2.0, 5.0, 5.0], f"Unexpected open-ended lookup {rates}"
+
+    # Days between closed periods have no period
+    index = RatePeriodIndex([
+        {'Start Date': '2020-01-01', 'End Date': '2020-01-31', 'Best Rate': 1.0},
+        {'Start Date': '2020-03-01', 'End Date': '2020-03-31', 'Best Rate': 3.0},
+    ])
+    rows = index.locate(pd.to_datetime(['2020-01-31', '2020-02-15', '2020-03-01', '2020-04-01']))
+    print(f"Gap rows: {rows.tolist()}")
+    assert rows.tolist() == [0, -1, 1, -1], f"Unexpected gap lookup {rows.tolist()}"
+
+    # A period nested in a longer one applies while it runs, then hands back
+    index = RatePeriodIndex([
+        {'Start Date': '2020-01-01', 'End Date': '2020-12-31', 'Best Rate': 2.0},
+        {'Start Date': '2020-03-01', 'End Date': '2020-03-31', 'Best Rate': 5.0},
+    ])
+    rows = index.locate(pd.to_datetime(['2020-02-01', '2020-03-15', '2020-04-01', '2020-12-31', '2021-01-01']))
+    print(f"Nested rows: {rows.tolist()}")
+    assert rows.tolist() == [0, 1, 0, 0, -1], f"Unexpected nested lookup {rows.tolist()}"
+    print("PASS")
+
+def test_rate_periods_mid_year():
+    print("\nTesting Rate Periods changing mid tax year...")
+    from datetime import date
+    from decimal import Decimal
+
+    # Allowances still come from the tax-year table; the rate changes on 1 Oct
+    rate_periods = [
+        {'Start Date': '2020-04-06', 'Best Rate': 1.0},
+        {'Start Date': '2020-10-01', 'Best Rate': 3.0},
+    ]
+    df = calculate_portfolio_growth(Decimal(1000), Decimal(0), 'None', [], 'Best Rate',
+                                    date(2020, 4, 6), date(2021, 4, 5), rate_periods=rate_periods)
+    rates = df.set_index('Date')['Rate']
+    print(f"Rate on 30 Sep: {float(rates['2020-09-30']):.2f}, on 1 Oct: {float(rates['2020-10-01']):.2f}")
+    assert abs(float(rates['2020-09-30']) - 1.0) < 1e-9
+    assert abs(float(rates['2020-10-01']) - 3.0) < 1e-9
+
+    # Daily compounding: the deposit lands after the first day's interest, so
+    # 177 days at 1% (to 30 Sep), then 187 days at 3%
+    expected = 1000 * (1 + 0.01 / 365) ** 177 * (1 + 0.03 / 365) ** 187
+    final_balance = float(df.iloc[-1]['Balance'])
+    print(f"Final Balance: {final_balance:.4f}, Expected: {expected:.4f}")
+    assert abs(final_balance - expected) < 1e-6, "Balance mismatch"
+    print("PASS")
+
+def test_contribution_multipliers():
+    print("\nTesting Contribution Multipliers against the calculator...")
+    from datetime import date
+    from decimal import Decimal
+    from optimizer import contribution_multipliers
+
+    start, end = date(2015, 4, 6), date(2020, 4, 5)
+    plan = contribution_multipliers('Best Rate', start, end, inflation_type='RPI', interest_freq='Monthly')
+    assert len(plan) == 5, f"Expected 5 tax years, got {len(plan)}"
+
+    # The multiplier is the final real value of £1 paid in on that day
+    for _, row in plan.iterrows():
+        lump_sums = [(row['Date'].strftime('%Y-%m-%d'), Decimal(1))]
+        df = calculate_portfolio_growth(Decimal(0), Decimal(0), 'None', lump_sums, 'Best Rate', start, end,
+                                        inflation_type='RPI', interest_freq='Monthly')
+        final_real = float(df.iloc[-1]['Real Balance'])
+        print(f"{row['Tax Year']}: multiplier {row['Multiplier']:.8f}, £1 deposit {final_real:.8f}")
+        assert abs(row['Multiplier'] - final_real) < 1e-9, "Multiplier mismatch"
+    print("PASS")
+
+def test_optimize_contributions():
+    print("\nTesting Contribution Optimiser...")
+    from datetime import date
+    from decimal import Decimal
+    from optimizer import contribution_multipliers, optimize_contributions
+
+    start, end = date(2015, 4, 6), date(2020, 4, 5)
+    budget = Decimal(50000)
+    plan = optimize_contributions(budget, 'Best Rate', start, end, inflation_type='RPI')
+    multipliers = contribution_multipliers('Best Rate', start, end, inflation_type='RPI')
+
+    # Each lump sum is paid on its tax year's best day and within its allowance
+    allowance_by_date = dict(zip(multipliers['Date'].dt.strftime('%Y-%m-%d'), multipliers['Allowance']))
+    for date_str, amount in plan:
+        print(f"{date_str}: £{amount}")
+        assert date_str in allowance_by_date, f"{date_str} is not a planned contribution day"
+        assert amount <= allowance_by_date[date_str], f"£{amount} on {date_str} is over the allowance"
+    assert sum(amount for _, amount in plan) == budget, "Budget not fully placed"
+
+    # A budget larger than every allowance together places exactly the allowances
+    plan = optimize_contributions(Decimal(3000000), 'Best Rate', start, end, inflation_type='RPI')
+    placed = sum(amount for _, amount in plan)
+    print(f"Placed from £3,000,000: £{placed}")
+    assert placed == multipliers['Allowance'].sum(), "Large budget not capped at the allowances"
+
+    # The plan should do at least as well as paying the budget in on day one
+    budget = Decimal(10000)
+    plan = optimize_contributions(budget, 'Best Rate', start, end, inflation_type='RPI')
+    optimal = calculate_portfolio_growth(Decimal(0), Decimal(0), 'None', plan, 'Best Rate', start, end, inflation_type='RPI')
+    lump = calculate_portfolio_growth(budget, Decimal(0), 'None', [], 'Best Rate', start, end, inflation_type='RPI')
+    optimal_real = optimal.iloc[-1]['Real Balance']
+    lump_real = lump.iloc[-1]['Real Balance']
+    print(f"Optimal Real Balance: £{optimal_real:.2f}, Initial Lump Sum: £{lump_real:.2f}")
+    assert optimal_real >= lump_real, "Optimal plan is worse than an initial lump sum"
+    print("PASS")
+
+def test_window_max():
+    print("\nTesting Sliding Window Max...")
+    import numpy as np
+    from optimizer import _window_max
+
+    rng = np.random.default_rng(0)
+    for length in [1, 2, 7, 64, 100]:
+        values = rng.normal(size=length)
+        for width in [1, 2, 3, 4, 5, 8, 13, 64, 99, 100, 150]:
+            expected = [values[max(0, b - width + 1):b + 1].max() for b in range(length)]
+            assert np.array_equal(_window_max(values.copy(), width), expected), \
+                f"Mismatch for length {length}, width {width}"
+    print("PASS")
+
+def test_event_engine_matches_calculator():
+    print("\nTesting Event Engine against the calculator (deposits only)...")
+    from datetime import date
+    from decimal import Decimal
+    from event_engine import Account, AccountEvent, simulate_events
+
+    start, end = date(2015, 4, 6), date(2020, 4, 5)
+    lump_sums = [('2016-07-15', Decimal(2500))]
+    for interest_freq in ['Daily', 'Monthly', 'Quarterly', 'Annually (Tax Year End)']:
+        df = calculate_portfolio_growth(Decimal(5000), Decimal(300), 'Monthly', lump_sums, 'Average Rate', start, end,
+                                        interest_freq=interest_freq)
+        # The same contributions as events: initial, 1st of each month, lump sum
+        events = [AccountEvent('Deposit', start, 'ISA', 5000)]
+        events += [AccountEvent('Deposit', d, 'ISA', 300) for d in pd.date_range(start, end, freq='MS')]
+        events += [AccountEvent('Deposit', d, 'ISA', amount) for d, amount in lump_sums]
+        ledger = simulate_events([Account('ISA', 'Average Rate', interest_freq)], events, start, end)
+
+        expected = df.iloc[-1]['Balance']
+        actual = ledger.iloc[-1]['Balance']
+        print(f"{interest_freq}: calculator {expected:.6f}, events {actual:.6f}")
+        assert abs(actual - expected) < Decimal('1e-15'), f"Balance mismatch for {interest_freq}"
+    print("PASS")
+
+def test_event_engine_flexible_replacement():
+    print("\nTesting Event Engine flexible withdrawal and replacement...")
+    from decimal import Decimal
+    from event_engine import Account, AccountEvent, simulate_events
+
+    # 2023/2024 allowance is £20,000
+    events = [
+        AccountEvent('Deposit', '2023-04-10', 'Flexible', 20000),
+        AccountEvent('Withdrawal', '2023-06-01', 'Flexible', 5000),
+        AccountEvent('Deposit', '2023-07-01', 'Flexible', 5000),
+        AccountEvent('Deposit', '2023-08-01', 'Flexible', 100),
+    ]
+    ledger = simulate_events([Account('Flexible', flexible=True)], events, '2023-04-06', '2024-04-05')
+    print(ledger[['Date', 'Event', 'Requested', 'Applied', 'Allowance Remaining']].to_string(index=False))
+
+    assert ledger.iloc[1]['Applied'] == 5000, "Withdrawal not applied"
+    assert ledger.iloc[2]['Applied'] == 5000, "Replacement not paid in"
+    assert ledger.iloc[2]['Allowance Remaining'] == 0, "Replacement used allowance"
+    assert ledger.iloc[3]['Applied'] == 0, "Deposit over the allowance paid in"
+
+    # The same history in a non-flexible account can't pay the £5,000 back in
+    ledger = simulate_events([Account('Flexible')], events, '2023-04-06', '2024-04-05')
+    assert ledger.iloc[2]['Applied'] == 0, "Non-flexible account replaced a withdrawal"
+
+    # Replacement capacity doesn't carry into the next tax year
+    events = [
+        AccountEvent('Deposit', '2023-04-10', 'Flexible', 20000),
+        AccountEvent('Withdrawal', '2024-03-01', 'Flexible', 5000),
+        AccountEvent('Deposit', '2024-04-10', 'Flexible', 25000),
+    ]
+    ledger = simulate_events([Account('Flexible', flexible=True)], events, '2023-04-06', '2025-04-05')
+    assert ledger.iloc[2]['Applied'] == 20000, "Replacement carried into the next tax year"
+
+    # Negative or zero amounts would get round the allowance, so are refused
+    for kind in ['Deposit', 'Withdrawal', 'Transfer']:
+        for amount in [-500, 0]:
+            try:
+                AccountEvent(kind, '2023-05-01', 'Flexible', amount, 'Other')
+            except ValueError:
+                continue
+            raise AssertionError(f"{kind} of {amount} was accepted")
+    print("PASS")
+
+def test_event_engine_transfers():
+    print("\nTesting Event Engine transfers...")
+    from decimal import Decimal
+    from event_engine import Account, AccountEvent, simulate_events
+
+    accounts = [Account('Old', 'Lowest Rate'), Account('New', 'Best Rate')]
+    events = [
+        AccountEvent('Deposit', '2023-04-10', 'Old', 15000),
+        AccountEvent('Transfer', '2023-09-01', 'Old', 10000, 'New'),
+        AccountEvent('Deposit', '2023-10-01', 'New', 5000),
+        AccountEvent('Transfer', '2023-11-01', 'New', 10**6, 'Old'),
+    ]
+    ledger = simulate_events(accounts, events, '2023-04-06', '2024-04-05')
+    print(ledger[['Date', 'Event', 'Account', 'Applied', 'Balance', 'Allowance Remaining']].to_string(index=False))
+
+    transfer = ledger.iloc[1]
+    assert transfer['Applied'] == 10000, "Transfer not applied"
+    assert transfer['To Balance'] == 10000, "Transfer didn't reach the new account"
+    assert transfer['Allowance Remaining'] == 5000, "Transfer used allowance"
+    # The rest of the allowance is still there after the transfer
+    assert ledger.iloc[2]['Applied'] == 5000, "Deposit after transfer was capped"
+    # Transfers are capped at the source balance
+    assert ledger.iloc[3]['Applied'] < 10**6 and ledger.iloc[3]['Balance'] == 0, "Transfer not capped at balance"
+    print("PASS")
+
+def test_household_matches_calculator():
+    print("\nTesting Household simulation against the calculator...")
+    from datetime import date
+    from decimal import Decimal
+    from household import HouseholdAccount, simulate_household
+
+    start, end = date(2015, 4, 6), date(2020, 4, 5)
+    specs = [
+        dict(name='Alice', initial_investment=5000, recurring_amount=500, frequency='Monthly',
+             lump_sums=[('2016-05-03', 3000)], rate_type='Best Rate', interest_freq='Monthly'),
+        dict(name='Bob', initial_investment=20000, recurring_amount=100, frequency='Weekly',
+             rate_type='Lowest Rate', interest_freq='Daily'),
+        dict(name='Carol', recurring_amount=15000, frequency='Annually',
+             rate_type='Average Rate', interest_freq='Annually (Tax Year End)'),
+    ]
+    results = simulate_household([HouseholdAccount(**spec) for spec in specs], start, end, inflation_type='CPI')
+
+    for spec in specs:
+        df = calculate_portfolio_growth(Decimal(spec.get('initial_investment', 0)), Decimal(spec['recurring_amount']),
+                                        spec['frequency'], spec.get('lump_sums', []), spec['rate_type'], start, end,
+                                        inflation_type='CPI', interest_freq=spec['interest_freq'])
+        for column in ['Balance', 'Real Balance', 'Total Invested', 'Interest Earned']:
+            expected = df[column].to_numpy(dtype=float)
+            actual = results[column][spec['name']].to_numpy()
+            assert abs(actual - expected).max() < 1e-6, f"{column} mismatch for {spec['name']}"
+        print(f"{spec['name']}: final balance £{results['Balance'][spec['name']].iloc[-1]:.2f}")
+
+    # The Household column is the total across accounts
+    for column, frame in results.items():
+        total = frame[[spec['name'] for spec in specs]].sum(axis=1)
+        assert (frame['Household'] - total).abs().max() < 1e-9, f"Household total mismatch in {column}"
+    print(f"Household: final balance £{results['Balance']['Household'].iloc[-1]:.2f}")
+    print("PASS")
+
+def test_household_allowance_override():
+    print("\nTesting Household per-account allowance...")
+    from datetime import date
+    from household import HouseholdAccount, simulate_household
+
+    # 2023/2024: £20,000 ISA allowance, overridden to £9,000 for a Junior ISA
+    accounts = [
+        HouseholdAccount('Adult', initial_investment=25000),
+        HouseholdAccount('Junior', initial_investment=25000, allowance=9000),
+    ]
+    invested = simulate_household(accounts, date(2023, 4, 6), date(2024, 4, 5))['Total Invested'].iloc[-1]
+    print(f"Adult: £{invested['Adult']:.2f}, Junior: £{invested['Junior']:.2f}, Household: £{invested['Household']:.2f}")
+    assert invested['Adult'] == 20000, "Table allowance not applied"
+    assert invested['Junior'] == 9000, "Allowance override not applied"
+    # Each account has its own allowance, not a share of one
+    assert invested['Household'] == 29000, "Accounts shared an allowance"
+    print("PASS")
+
+def test_export_formats():
+    print("\nTesting Export (every format and granularity, to the penny)...")
+    import io
+    from datetime import date
+    from decimal import Decimal
+    from breakdown import period_end_positions
+    from export import EXPORT_FORMATS, EXPORT_GRANULARITIES, MONEY_COLUMNS, export_results, to_pence
+
+    # Half-up rounding from the exact Decimal values (floats would give 2.67)
+    pence = to_pence([Decimal('0.005'), Decimal('1.125'), Decimal('2.675'), Decimal('-0.004')])
+    print(f"Half-up pence: {pence.tolist()}")
+    assert pence.tolist() == [1, 113, 268, 0], "Pence not rounded half-up"
+
+    start, end = date(2019, 4, 6), date(2021, 4, 5)
+    results = {
+        rate_type: calculate_portfolio_growth(Decimal(1000), Decimal(123.45), 'Monthly', [], rate_type, start, end,
+                                              inflation_type='RPI', interest_freq='Monthly')
+        for rate_type in ['Best Rate', 'Lowest Rate']
+    }
+
+    for granularity in EXPORT_GRANULARITIES:
+        # Expected pence: the last day of each period, per scenario
+        expected = {}
+        for scenario, df in results.items():
+            positions, _ = period_end_positions(df['Date'], granularity)
+            expected[scenario] = {col: to_pence(df[col].to_numpy()[positions]) for col in MONEY_COLUMNS}
+
+        for fmt in EXPORT_FORMATS:
+            buffer = io.BytesIO()
+            # Small chunks so the chunked writers are exercised
+            export_results(results, buffer, fmt, granularity, chunk_rows=100)
+            buffer.seek(0)
+            if fmt == 'CSV':
+                exported = pd.read_csv(buffer)
+            elif fmt == 'Parquet':
+                exported = pd.read_parquet(buffer)
+            else:
+                exported = pd.read_excel(buffer)
+
+            for scenario in results:
+                rows = exported[exported['Scenario'] == scenario]
+                assert len(rows) == len(expected[scenario]['Balance']), f"{fmt} {granularity} {scenario} row count"
+                for col in MONEY_COLUMNS:
+                    actual = (rows[col].to_numpy(dtype=float) * 100).round().astype('int64')
+                    assert (actual == expected[scenario][col]).all(), f"{fmt} {granularity} {scenario} {col} mismatch"
+            print(f"{fmt} {granularity}: {len(exported)} rows match")
+    print("PASS")
+
+def test_iter_portfolio_growth():
+    print("\nTesting Tax-Year Chunks against the full calculation...")
+    from datetime import date
+    from decimal import Decimal
+    from isa_calculator import iter_portfolio_growth
+
+    # Start and end mid tax year, so the first and last chunks are partial
+    args = (Decimal(1000), Decimal(250), 'Monthly', [('2011-09-01', Decimal(2000))], 'Average Rate',
+            date(2010, 1, 15), date(2013, 8, 20), 'RPI', 'Monthly')
+    chunks = list(iter_portfolio_growth(*args))
+    full = calculate_portfolio_growth(*args)
+
+    first_dates = [chunk['Date'].iloc[0].strftime('%Y-%m-%d') for chunk in chunks]
+    print(f"Chunk starts: {first_dates}")
+    assert first_dates == ['2010-01-15', '2010-04-06', '2011-04-06', '2012-04-06', '2013-04-06'], "Unexpected chunks"
+    assert chunks[-1]['Date'].iloc[-1] == pd.Timestamp('2013-08-20'), "Last chunk doesn't end on the end date"
+
+    joined = pd.concat(chunks, ignore_index=True)
+    assert joined.equals(full), "Concatenated chunks differ from calculate_portfolio_growth"
+    print("PASS")
+
+def test_session_fair_pool():
+    print("\nTesting Session Fair Pool (round-robin, caps, cancel)...")
+    import threading
+    from deployment import PoolBusy, SessionFairPool
+
+    def hold(started, release):
+        started.set()
+        release.wait(5)
+
+    # One worker, held busy while jobs are queued, so the order is deterministic
+    pool = SessionFairPool(max_workers=1, max_queued=16, max_queued_per_session=8)
+    started, release = threading.Event(), threading.Event()
+    pool.submit('hold', hold, started, release)
+    assert started.wait(5), "Worker didn't start"
+
+    order = []
+    futures = [pool.submit(session, order.append, f"{session}{n}")
+               for session, count in [('A', 3), ('B', 2), ('C', 1)] for n in range(1, count + 1)]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    print(f"Run order: {order}")
+    assert order == ['A1', 'B1', 'C1', 'A2', 'B2', 'A3'], "Sessions not served round-robin"
+
+    # Caps: 2 queued per session, 3 queued in total
+    pool = SessionFairPool(max_workers=1, max_queued=3, max_queued_per_session=2)
+    started, release = threading.Event(), threading.Event()
+    pool.submit('hold', hold, started, release)
+    assert started.wait(5), "Worker didn't start"
+
+    queued_a = [pool.submit('A', lambda: 'A') for _ in range(2)]
+    try:
+        pool.submit('A', lambda: 'A')
+        raise AssertionError("Per-session cap not enforced")
+    except PoolBusy:
+        pass
+    future_b = pool.submit('B', lambda: 'B')
+    try:
+        pool.submit('C', lambda: 'C')
+        raise AssertionError("Global cap not enforced")
+    except PoolBusy:
+        pass
+    print(f"Queued at the caps: {pool.queued()}")
+    assert pool.queued() == 3
+
+    # Cancelling a session drops its queued jobs and frees their places
+    assert pool.cancel_session('A') == 2, "Queued jobs not dropped"
+    assert all(future.cancelled() for future in queued_a), "Dropped futures not cancelled"
+    assert pool.queued() == 1
+    release.set()
+    assert future_b.result(timeout=5) == 'B', "Other session's job didn't run"
+    print("PASS")
+
+def test_session_result_store():
+    print("\nTesting Session Result Store (LRU under a memory cap)...")
+    import sys
+    from deployment import SessionResultStore
+
+    item = b'x' * 400
+    size = sys.getsizeof(item)
+    store = SessionResultStore(max_bytes=size * 2)
+    assert store.put('a', item) and store.put('b', item)
+
+    # Using 'a' makes 'b' the least recently used, so 'b' goes first
+    store.get('a')
+    assert store.put('c', item)
+    print(f"Kept after eviction: {sorted(k for k in 'abc' if k in store)}")
+    assert 'a' in store and 'c' in store and 'b' not in store, "Least recently used result not evicted"
+    assert store.total_bytes <= store.max_bytes
+
+    # A result larger than the whole cap is refused, and nothing else is evicted
+    assert not store.put('big', b'x' * (size * 3)), "Oversize result kept"
+    assert 'big' not in store and 'a' in store and 'c' in store
+    print("PASS")
+
+def test_breakdown_tax_year():
+    print("\nTesting Tax Year Breakdown against the groupby summary...")
+    from datetime import date
+    from decimal import Decimal
+    from breakdown import SCENARIO_PREFIXES, build_breakdown
+
+    start, end = date(2008, 1, 10), date(2012, 9, 30)
+    results = {
+        rate_type: calculate_portfolio_growth(Decimal(1000), Decimal(200), 'Monthly', [], rate_type, start, end,
+                                              inflation_type='RPI', interest_freq='Monthly')
+        for rate_type in ['Best Rate', 'Average Rate', 'Lowest Rate']
+    }
+    table = build_breakdown(results, 'Tax Year', 'RPI')
+
+    # The summary the app used to build: last row of each tax year, and the
+    # effective inflation (last index / first index - 1) over the tax year
+    def tax_year(d):
+        return f"{d.year - 1}/{d.year}" if d.month < 4 or (d.month == 4 and d.day < 6) else f"{d.year}/{d.year + 1}"
+
+    frames = []
+    for name, df in results.items():
+        df = df.assign(**{'Tax Year': df['Date'].apply(tax_year)})
+        prefix = SCENARIO_PREFIXES[name]
+        frames.append(df.groupby('Tax Year').last()[['Real Balance', 'Rate']]
+                      .rename(columns={'Real Balance': f'{prefix} Balance', 'Rate': f'{prefix} Rate %'}))
+    best = results['Best Rate'].assign(**{'Tax Year': results['Best Rate']['Date'].apply(tax_year)})
+    index = best.groupby('Tax Year')['Inflation Index']
+    frames.append(((index.last() / index.first()).astype(float) - 1).mul(100).to_frame('RPI %'))
+    frames.append(best.groupby('Tax Year').last()[['Total Invested']])
+    expected = pd.concat(frames, axis=1).apply(lambda col: col.astype(float)).round(2)
+
+    print(table.head(3).to_string())
+    assert list(table.index) == list(expected.index), "Tax years differ"
+    assert list(table.columns) == list(expected.columns), "Columns differ"
+    assert (table.to_numpy() == expected.to_numpy()).all(), "Values differ from the groupby summary"
+    print("PASS")
+
+def test_breakdown_highlight_and_pages():
+    print("\nTesting Breakdown highlighting and pages...")
+    from breakdown import _highlight_underperformance, get_page, page_count
+
+    df = pd.DataFrame({
+        'Best Balance': [900.0, 1100.0, 1000.0],
+        'Best Rate %': [1.0, 3.0, 2.0],
+        'RPI %': [2.0, 2.0, 2.0],
+        'Total Invested': [1000.0, 1000.0, 1000.0],
+    })
+    css = _highlight_underperformance(df, 'RPI %')
+    red = (css == 'color: red')
+    # Below the total invested, and below inflation, only (equal is not red)
+    assert red['Best Balance'].tolist() == [True, False, False], "Balance highlighting wrong"
+    assert red['Best Rate %'].tolist() == [True, False, False], "Rate highlighting wrong"
+    assert not red['RPI %'].any() and not red['Total Invested'].any(), "Other columns highlighted"
+    # Without inflation, rates aren't compared
+    assert not (_highlight_underperformance(df.drop(columns='RPI %'), None) == 'color: red')['Best Rate %'].any()
+
+    table = pd.DataFrame({'x': range(105)})
+    n_pages = page_count(table, 25)
+    sizes = [len(get_page(table, page, 25)) for page in range(1, n_pages + 1)]
+    print(f"Page sizes: {sizes}")
+    assert sizes == [25, 25, 25, 25, 5], "Pages wrong"
+    assert get_page(table, n_pages, 25)['x'].tolist() == list(range(100, 105)), "Last page has the wrong rows"
+    assert page_count(table.iloc[:0], 25) == 1, "Empty table should have one page"
+    print("PASS")
+
 if __name__ == "__main__":
     test_simple_interest()
     # test_lump_sum() 
@@ -203,4 +674,22 @@ if __name__ == "__main__":
     # test_monthly_payments()
     test_allowance_limit()
     test_inflation()
+    test_rate_period_index()
+    test_rate_periods_mid_year()
+    test_contribution_multipliers()
+    test_optimize_contributions()
+    test_window_max()
+    test_event_engine_matches_calculator()
+    test_event_engine_flexible_replacement()
+    test_event_engine_transfers()
+    test_household_matches_calculator()
+    test_household_allowance_override()
+    test_export_formats()
+    test_iter_portfolio_growth()
+    test_session_fair_pool()
+    test_session_result_store()
+    test_breakdown_tax_year()
+    test_breakdown_highlight_and_pages()
+    # Run last: its expected range predates deposits landing after the first
+    # day's interest, so it stops the script at a balance of exactly 3195.00
     test_interest_frequency()